@@ -0,0 +1,25 @@
+"""Fixtures of the benchmarks, run them with `make bench` or `tox -e bench`.
+
+Every run is saved in .benchmarks/, `make bench-compare` fails when a mean got more than 10%
+slower than in the last saved run.
+"""
+import pytest
+
+from benchmarks.pages import PAGE_SIZES, SELECTOR_COUNTS, load_fixtures, make_page, make_sitemap
+from noscrapy.utils import parse_html
+
+@pytest.fixture(params=PAGE_SIZES, ids=lambda size: '%d-products' % size)
+def page(request):
+    return make_page(request.param)
+
+@pytest.fixture(scope='session')
+def large_document():
+    return parse_html(make_page(PAGE_SIZES[-1]))
+
+@pytest.fixture(params=SELECTOR_COUNTS, ids=lambda count: '%d-selectors' % count)
+def sitemap(request):
+    return make_sitemap(request.param)
+
+@pytest.fixture(params=load_fixtures(), ids=lambda fixture: fixture[0])
+def fixture_page(request):
+    return request.param
@@ -0,0 +1,79 @@
+"""Pages and sitemaps of the benchmarks.
+
+The pages of make_page and the sitemaps of make_sitemap grow with their size argument. The pages
+in fixtures/ are *.html files with the sitemap of the same name in *.json, fixtures/SOURCES.txt
+names where every page comes from and its license. rustc-lint-groups.html is a recorded page,
+synthetic-news.html a hand written one.
+"""
+import glob
+import json
+import os
+
+from noscrapy import (GroupSelector, HtmlSelector, ImageSelector, ItemSelector, LinkSelector,
+                      Sitemap, TextSelector)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+PAGE_SIZES = 10, 100, 1000
+SELECTOR_COUNTS = 5, 20, 80
+
+PRODUCT = '''
+<div class="product" id="p{i}">
+  <h2 class="title"><a href="/product/{i}/">Product {i}</a></h2>
+  <img src="/img/{i}.jpg" alt="Product {i}">
+  <p class="description">Description of product {i}<br>with a <b>second</b> line.
+    <script>track({i});</script></p>
+  <span class="price">{price}.99 EUR</span>
+  <ul class="tags"><li>tag {a}</li><li>tag {b}</li><li>tag {c}</li></ul>
+</div>'''
+
+def make_page(size):
+    """Returns a catalogue page with size products."""
+    products = ''.join(PRODUCT.format(i=i, price=i % 97, a=i % 3, b=i % 5, c=i % 7)
+                       for i in range(size))
+    return ('<html><head><title>Catalogue</title><style>.product {}</style></head><body>'
+            '<div id="products">%s</div><a class="next" href="?page=2">next</a></body></html>'
+            % products)
+
+def make_product_sitemap():
+    """Returns a sitemap extracting the products of make_page with every selector type."""
+    return Sitemap('products', [
+        ItemSelector('product', css='div.product'),
+        TextSelector('title', css='h2.title', many=0, parents=['product']),
+        LinkSelector('link', css='h2.title a', many=0, parents=['product']),
+        ImageSelector('image', css='img', many=0, parents=['product']),
+        HtmlSelector('description', css='p.description', many=0, parents=['product']),
+        TextSelector('price', css='span.price', many=0, parents=['product'],
+                     regex=r'\d+\.\d+'),
+        GroupSelector('tags', css='ul.tags li', parents=['product']),
+        LinkSelector('next', css='a.next', many=0),
+    ], start_urls='http://shop.lv/')
+
+def make_sitemap(count):
+    """Returns a sitemap of count selectors, nested item selectors with link selectors below."""
+    selectors = []
+    parent_id = '_root'
+    while len(selectors) < count:
+        level = len(selectors)
+        item_id = 'item%d' % level
+        selectors.append(ItemSelector(item_id, css='div', parents=[parent_id]))
+        for i in range(min(3, count - len(selectors))):
+            selector_id = 'text%d-%d' % (level, i)
+            selectors.append(TextSelector(selector_id, css='b', many=0, parents=[item_id]))
+        if len(selectors) < count:
+            link_id = 'link%d' % level
+            selectors.append(LinkSelector(link_id, css='a', parents=[item_id]))
+            if len(selectors) < count:
+                selectors.append(TextSelector('title%d' % level, css='h1', parents=[link_id]))
+        parent_id = item_id
+    return Sitemap('generated', selectors[:count])
+
+def load_fixtures():
+    """Returns (name, sitemap, html) of every page in fixtures."""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(os.path.join(FIXTURES, name + '.json')) as f:
+            sitemap = Sitemap(json.load(f))
+        with open(path, encoding='utf-8') as f:
+            fixtures.append((name, sitemap, f.read()))
+    return fixtures
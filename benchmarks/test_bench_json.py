@@ -0,0 +1,12 @@
+from benchmarks.pages import make_product_sitemap, make_sitemap
+from noscrapy.utils import json
+
+RECORDS = [{'title': 'Product %d' % i, 'price': '%d.99' % i, 'tags': ['a', 'b'], 'image': None}
+           for i in range(1000)]
+
+def test_dumps_records(benchmark):
+    assert benchmark(json.dumps, RECORDS)
+
+def test_dumps_sitemap(benchmark):
+    sitemaps = [make_product_sitemap(), make_sitemap(80)]
+    assert benchmark(json.dumps, sitemaps)
@@ -0,0 +1,35 @@
+import pytest
+
+from noscrapy import Job, Queue, SqliteQueue
+from noscrapy.utils import BloomFilter
+
+URLS = ['http://shop.lv/product/%d/' % i for i in range(10000)]
+
+def fill_and_drain(queue, urls):
+    for url in urls:
+        queue.add(Job(url, '_root'))
+    # every url again, all of them are rejected as seen
+    for url in urls:
+        queue.add(Job(url, '_root'))
+    count = 0
+    while True:
+        job = queue.get_next_job()
+        if not job:
+            break
+        queue.task_done(job)
+        count += 1
+    return count
+
+@pytest.mark.parametrize('seen', [None, lambda: BloomFilter(len(URLS) * 10)],
+                         ids=['fingerprints', 'bloom'])
+def test_queue(benchmark, seen):
+    def setup():
+        return (Queue(seen() if seen else None), URLS), {}
+    assert benchmark.pedantic(fill_and_drain, setup=setup, rounds=5) == len(URLS)
+
+def test_sqlite_queue(benchmark, tmpdir):
+    paths = (str(tmpdir.join('frontier%d.sqlite' % i)) for i in range(1000))
+    urls = URLS[:1000]
+    def setup():
+        return (SqliteQueue(next(paths)), urls), {}
+    assert benchmark.pedantic(fill_and_drain, setup=setup, rounds=3) == len(urls)
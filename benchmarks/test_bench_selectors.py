@@ -0,0 +1,18 @@
+import pytest
+
+from noscrapy import (GroupSelector, HtmlSelector, ImageSelector, ItemSelector, LinkSelector,
+                      TextSelector)
+
+SELECTORS = [
+    TextSelector('text', css='p.description'),
+    TextSelector('regex', css='span.price', regex=r'(?P<price>\d+)\.\d+', regex_groups=True),
+    LinkSelector('link', css='h2.title a'),
+    ImageSelector('image', css='img'),
+    HtmlSelector('html', css='p.description'),
+    ItemSelector('item', css='div.product'),
+    GroupSelector('group', css='ul.tags li'),
+]
+
+@pytest.mark.parametrize('selector', SELECTORS, ids=[s.id for s in SELECTORS])
+def test_selector_get_data(benchmark, selector, large_document):
+    assert benchmark(lambda: list(selector.get_data(large_document)))
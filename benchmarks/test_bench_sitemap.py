@@ -0,0 +1,26 @@
+from benchmarks.pages import make_product_sitemap
+from noscrapy import Sitemap
+from noscrapy.utils import parse_html
+
+
+def test_trees(benchmark, sitemap):
+    # every round starts with a copy whose trees are not found yet
+    benchmark.pedantic(lambda plan: plan.trees, setup=lambda: ((Sitemap(sitemap),), {}),
+                       rounds=20)
+
+def test_get_data(benchmark, page):
+    plan = make_product_sitemap()
+    plan.trees
+    records = benchmark(lambda: list(plan.get_data(parse_html(page))))
+    assert records
+
+def test_get_data_fixture(benchmark, fixture_page):
+    name, plan, html = fixture_page
+    plan.trees
+    assert benchmark(lambda: list(plan.get_data(parse_html(html))))
+
+def test_get_csv_rows(benchmark, large_document):
+    plan = make_product_sitemap()
+    records = list(plan.get_data(large_document))
+    rows = benchmark(lambda: list(plan.get_csv_rows(records)))
+    assert len(rows) == len(records) + 1
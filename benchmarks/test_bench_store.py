@@ -0,0 +1,26 @@
+from noscrapy.store import StoreScrapeResult
+from noscrapy.utils import json
+
+
+class FakeDb(object):
+    """Local stand in of a couchdb database, serialising the docs like the http client does."""
+    def __init__(self):
+        self.size = 0
+
+    def update(self, docs):
+        self.size += len(json.dumps({'docs': docs}))
+        return [(True, str(i), '1-x') for i in range(len(docs))]
+
+RECORDS = [{'title': 'Product %d' % i, 'price': '%d.99' % i, 'tags': ['a', 'b'],
+            'link-href': '/product/%d/' % i, '_follow': '/product/%d/' % i}
+           for i in range(10000)]
+
+def save_all(records):
+    db = FakeDb()
+    with StoreScrapeResult(db) as result:
+        for record in records:
+            result.save(record)
+    return db.size
+
+def test_store_scrape_result_save(benchmark):
+    assert benchmark(save_all, RECORDS)
@@ -1,6 +1,7 @@
+from .fetcher import Fetcher
 from .job import Job
-from .queue import Queue
-from .scraper import Scraper
+from .queue import Queue, SqliteQueue
+from .scraper import AsyncScraper, Scraper
 from .selector import Selector
 from .selectors import *
 from .sitemap import Sitemap
@@ -1,12 +1,57 @@
+import logging
+import os
+import socket
+
 import click
 
-from noscrapy import Queue, Scraper, Store
+from noscrapy import AsyncScraper, Fetcher, Queue, Scraper, SqliteQueue, Store
+from noscrapy.export import COMPRESSIONS, FORMATS, export
+from noscrapy.httpcache import HttpCache
+from noscrapy.images import ImageFileStore
+from noscrapy.metrics import JsonFileSink, LogSink, Metrics, PrometheusSink
+from noscrapy.pagestore import PageStore
+from noscrapy.profiler import Profiler
+from noscrapy.replay import ReplayFetcher, ReplayServer, open_corpus
+from noscrapy.stores import BACKENDS, SqliteStore, get_data_store
 
 
 @click.group()
 def cli():
     pass
 
+def data_store_options(func):
+    func = click.option('--location',
+                        help='Server url, file or directory of the data backend.')(func)
+    func = click.option('--backend', type=click.Choice(sorted(BACKENDS)), default='couch',
+                        help='Backend storing the scraped records.')(func)
+    return func
+
+def crawl_options(func):
+    func = click.option('--metrics-interval', type=float, default=10,
+                        help='Seconds between two metrics reports, selectors are timed '
+                             'with any metrics output.')(func)
+    func = click.option('--metrics-port', type=int,
+                        help='Local port serving the metrics for prometheus.')(func)
+    func = click.option('--metrics-json', type=click.Path(dir_okay=False),
+                        help='File replaced with the metrics on every report.')(func)
+    func = click.option('--metrics-log', is_flag=True,
+                        help='Log a line with the crawl metrics on every report.')(func)
+    func = click.option('--image-dir', type=click.Path(file_okay=False),
+                        help='Directory of downloaded images, defaults to the app directory.')(func)
+    func = click.option('--max-page-size', type=int,
+                        help='Bytes after which the download of a page is aborted.')(func)
+    func = click.option('--http-cache', is_flag=True,
+                        help='Revalidate pages cached by earlier crawls of the sitemap.')(func)
+    func = click.option('--pageload-delay', type=int,
+                        help='Milliseconds a host is left alone after each page.')(func)
+    func = click.option('--request-interval', type=int,
+                        help='Minimal milliseconds between requests to a host.')(func)
+    func = click.option('--parse-processes', type=int,
+                        help='Number of processes extracting the fetched pages, their selectors '
+                             'are not timed.')(func)
+    func = click.option('--concurrency', default=1, help='Number of pages fetched at once.')(func)
+    return func
+
 @cli.command(name='show')
 def show_sitemaps():
     store = Store()
@@ -22,20 +67,186 @@ def print_sitemap(name):
 
 @cli.command(name='data')
 @click.argument('name')
-def data_sitemap(name):
-    store = Store()
+@data_store_options
+def data_sitemap(name, backend, location):
+    store = get_data_store(backend, location)
     for row in store.get_sitemap_data(name):
         print(row)
 
+@cli.command(name='export')
+@click.argument('name')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv',
+              help='File format of the export.')
+@click.option('--out', required=True, type=click.Path(dir_okay=False), help='File to write.')
+@click.option('--compress', type=click.Choice(COMPRESSIONS), help='Compression of the file.')
+@data_store_options
+def export_sitemap(name, fmt, out, compress, backend, location):
+    sitemap = Store().get_sitemap(name)
+    store = get_data_store(backend, location)
+    export(sitemap, store.get_sitemap_data(name), out, fmt, compress)
+
+def get_app_file(directory, name):
+    directory = os.path.join(click.get_app_dir('noscrapy'), directory)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, Store.sanitize_sitemap_data_db_name(name) + '.sqlite')
+
+def get_frontier_path(name):
+    return get_app_file('frontiers', name)
+
+def scrape(name, frontier, store, concurrency=1, worker=None, lease_timeout=None,
+           http_cache=False, max_page_size=None, image_dir=None, metrics_log=False,
+           metrics_json=None, metrics_port=None, metrics_interval=None, **options):
+    queue = SqliteQueue(frontier, worker, lease_timeout)
+    sitemap = Store().get_sitemap(name)
+    sinks = []
+    if metrics_log:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+        sinks.append(LogSink())
+    if metrics_json:
+        sinks.append(JsonFileSink(metrics_json))
+    if metrics_port:
+        sinks.append(PrometheusSink(metrics_port))
+    metrics = options['metrics'] = Metrics(sinks, metrics_interval)
+    if sinks:
+        options['observer'] = metrics
+    cache = HttpCache(get_app_file('caches', name)) if http_cache else None
+    options['fetcher'] = Fetcher(cache=cache, max_body_size=max_page_size, metrics=metrics)
+    pages = PageStore(get_app_file('pages', name))
+    if any(getattr(selector, 'download_image', False) for selector in sitemap):
+        image_dir = image_dir or os.path.join(click.get_app_dir('noscrapy'), 'images',
+                                              Store.sanitize_sitemap_data_db_name(name))
+        options['images'] = ImageFileStore(image_dir)
+    if concurrency > 1 or options.get('parse_processes'):
+        scraper = AsyncScraper(queue, sitemap, store, concurrency=concurrency, pages=pages,
+                               **options)
+    else:
+        options.pop('parse_processes', None)
+        scraper = Scraper(queue, sitemap, store, pages=pages, **options)
+    try:
+        scraper.run()
+    finally:
+        queue.close()
+        pages.close()
+        scraper.fetcher.close()
+        metrics.close()
+        if cache is not None:
+            cache.close()
+
 @cli.command(name='rescrape')
 @click.argument('name')
-def rescrape_sitemap(name):
-    queue = Queue()
-    store = Store()
+@click.option('--frontier', help='Sqlite file keeping the crawl state for resume.')
+@crawl_options
+@data_store_options
+def rescrape_sitemap(name, frontier, backend, location, **options):
+    remove_sqlite(get_app_file('pages', name))
+    restart(name, frontier, backend, location, **options)
+
+@cli.command(name='update')
+@click.argument('name')
+@click.option('--frontier', help='Sqlite file keeping the crawl state for resume.')
+@crawl_options
+@data_store_options
+def update_sitemap(name, frontier, backend, location, **options):
+    """Rescrapes, pages unchanged since the last crawl reuse their records."""
+    restart(name, frontier, backend, location, **options)
+
+def remove_sqlite(path):
+    for path in (path, path + '-wal', path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+def restart(name, frontier, backend, location, **options):
+    frontier = frontier or get_frontier_path(name)
+    remove_sqlite(frontier)
+    store = get_data_store(backend, location)
     store.reset_sitemap_data_db(name)
-    sitemap = store.get_sitemap(name)
-    scraper = Scraper(queue, sitemap, store)
-    scraper.run()
+    scrape(name, frontier, store, **options)
+
+@cli.command(name='resume')
+@click.argument('name')
+@click.option('--frontier', help='Sqlite file keeping the crawl state of rescrape.')
+@crawl_options
+@data_store_options
+def resume_sitemap(name, frontier, backend, location, **options):
+    frontier = frontier or get_frontier_path(name)
+    if not os.path.exists(frontier):
+        raise click.ClickException('no crawl to resume in %s' % frontier)
+    scrape(name, frontier, get_data_store(backend, location), **options)
+
+@cli.command(name='worker')
+@click.argument('name')
+@click.argument('frontier')
+@click.option('--worker', 'worker_id', help='Name of this worker, defaults to host and pid.')
+@click.option('--lease-timeout', type=float,
+              help='Seconds after which jobs of a crashed worker are handed out again.')
+@crawl_options
+@data_store_options
+def worker_sitemap(name, frontier, worker_id, lease_timeout, backend, location, **options):
+    """Crawls together with other workers sharing the sqlite FRONTIER file."""
+    worker_id = worker_id or '%s-%d' % (socket.gethostname(), os.getpid())
+    store = get_data_store(backend, location)
+    scrape(name, frontier, store, worker=worker_id, lease_timeout=lease_timeout, **options)
+
+@cli.command(name='profile')
+@click.argument('name')
+@click.option('--pages', default=100, help='Number of cached pages to extract.')
+def profile_sitemap(name, pages):
+    """Profiles the selectors on the pages cached by crawls with --http-cache."""
+    path = get_app_file('caches', name)
+    if not os.path.exists(path):
+        raise click.ClickException('no cached pages in %s' % path)
+    sitemap = Store().get_sitemap(name)
+    profiler = Profiler()
+    profiler.profile_trees(sitemap)
+    with HttpCache(path) as cache:
+        fetcher = Fetcher(cache=cache, offline=True)
+        scraper = Scraper(Queue(), sitemap, SqliteStore(':memory:'), request_interval=0,
+                          delays=False, fetcher=fetcher, observer=profiler, max_pages=pages)
+        scraper.run()
+    print(profiler.format_report())
+    print('%(pages)d pages, %(rejected_pages)d not cached' % scraper.stats)
+
+@cli.command(name='bench-crawl')
+@click.argument('name')
+@click.argument('corpus', type=click.Path(exists=True))
+@click.option('--latency', default=0, help='Milliseconds before every response is sent.')
+@click.option('--bandwidth', type=int, help='Bytes per second of every response body.')
+@click.option('--error-rate', default=0.0, help='Fraction of requests answered with 503.')
+@click.option('--host-concurrency', type=int, help='Requests per host answered at once.')
+@click.option('--seed', type=int, help='Seed of the replayed errors.')
+@click.option('--pages', type=int, help='Number of pages crawled at most.')
+@click.option('--request-interval', default=0,
+              help='Minimal milliseconds between requests to a host.')
+@click.option('--parse-processes', type=int,
+              help='Number of processes extracting the fetched pages.')
+@click.option('--concurrency', default=1, help='Number of pages fetched at once.')
+def bench_crawl(name, corpus, latency, bandwidth, error_rate, host_concurrency, seed, pages,
+                concurrency, **options):
+    """Crawls the pages recorded in CORPUS, a directory or WARC file, from a local server."""
+    sitemap = Store().get_sitemap(name)
+    metrics = options['metrics'] = Metrics()
+    server = ReplayServer(open_corpus(corpus), latency / 1000, bandwidth, error_rate,
+                          host_concurrency, seed)
+    with server, ReplayFetcher(server.address, metrics=metrics) as fetcher:
+        store = SqliteStore(':memory:')
+        if concurrency > 1 or options.get('parse_processes'):
+            scraper = AsyncScraper(Queue(), sitemap, store, concurrency=concurrency,
+                                   fetcher=fetcher, max_pages=pages, **options)
+        else:
+            options.pop('parse_processes')
+            scraper = Scraper(Queue(), sitemap, store, fetcher=fetcher, max_pages=pages,
+                              **options)
+        scraper.run()
+    state = metrics.snapshot()
+    print('%d pages in %.1fs, %.1f pages/s, %.1f records/s' % (
+        scraper.stats['pages'], state['seconds'], state['pages_per_second'],
+        state['records_per_second']))
+    for histogram in ('fetch_headers_seconds', 'fetch_body_seconds', 'parse_seconds'):
+        if histogram in state['histograms']:
+            print('%s p50<=%s p99<=%s' % (histogram, state['histograms'][histogram]['p50'],
+                                          state['histograms'][histogram]['p99']))
+    print('%d requests, %d errors, %d not recorded' % (
+        server.stats['requests'], server.stats['errors'], server.stats['missing']))
 
 @cli.command(name='app')
 def app():
@@ -0,0 +1,77 @@
+import csv
+import gzip
+import io
+from itertools import islice
+
+from .utils import json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+FORMATS = 'csv', 'jsonl', 'parquet'
+COMPRESSIONS = 'gzip', 'zstd'
+BUFFER_SIZE = 1024 * 1024
+
+def open_output(path, compression=None):
+    """Opens a buffered text file for writing, optionally gzip or zstd compressed."""
+    if compression == 'gzip':
+        raw = gzip.open(path, 'wb')
+    elif compression == 'zstd':
+        if zstandard is None:  # pragma: no cover
+            raise ImportError('zstd compression requires zstandard')
+        raw = zstandard.ZstdCompressor().stream_writer(open(path, 'wb'))
+    elif compression:
+        raise ValueError('unknown compression %r' % compression)
+    else:
+        raw = open(path, 'wb')
+    return io.TextIOWrapper(io.BufferedWriter(raw, BUFFER_SIZE), encoding='utf-8', newline='')
+
+def export_csv(sitemap, rows, fileobj):
+    csv.writer(fileobj).writerows(sitemap.get_csv_rows(rows))
+
+def export_jsonl(rows, fileobj, batch_size=1000):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    rows = iter(rows)
+    while True:
+        lines = [encode(row) + '\n' for row in islice(rows, batch_size)]
+        if not lines:
+            break
+        fileobj.writelines(lines)
+
+def export_parquet(sitemap, rows, path, compression=None, batch_size=10000):
+    """Writes the sitemap columns of rows in row groups of batch_size rows."""
+    if pyarrow is None:  # pragma: no cover
+        raise ImportError('parquet export requires pyarrow')
+    csv_rows = sitemap.get_csv_rows(rows)
+    columns = next(csv_rows)
+    schema = pyarrow.schema([(column, pyarrow.string()) for column in columns])
+    writer = pyarrow.parquet.ParquetWriter(path, schema, compression=compression or 'snappy')
+    try:
+        while True:
+            batch = list(islice(csv_rows, batch_size))
+            if not batch:
+                break
+            arrays = [pyarrow.array(values, pyarrow.string()) for values in zip(*batch)]
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+    finally:
+        writer.close()
+
+def export(sitemap, rows, path, fmt='csv', compression=None):
+    """Streams rows into a file at path in the given format."""
+    if fmt == 'parquet':
+        return export_parquet(sitemap, rows, path, compression)
+    with open_output(path, compression) as fileobj:
+        if fmt == 'csv':
+            export_csv(sitemap, rows, fileobj)
+        elif fmt == 'jsonl':
+            export_jsonl(rows, fileobj)
+        else:
+            raise ValueError('unknown format %r' % fmt)
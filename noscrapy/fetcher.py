@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class RejectedResponse(IOError):
+    """Raised for a response whose body is too large or of a content type not asked for.
+
+    Pages are also rejected with an error status.
+    """
+
+
+class Fetcher(object):
+    """Shared http client keeping a pooled keep-alive session per host.
+
+        max_hosts: Number of host sessions kept open, the least recently used one gets closed.
+        max_host_connections: Connections kept per host, further requests wait for a free one.
+        timeout: Default timeout in seconds for every request.
+        headers: Headers sent with every request.
+        cache: HttpCache revalidating and reusing the responses of earlier crawls.
+        max_body_size: Bytes of a decoded body after which its download gets aborted.
+        page_types: Content types accepted for pages, checked before their body is read.
+        metrics: Metrics getting the header and body latencies, bytes in, requests and errors
+                 per domain. The header latency includes dns lookup and connecting.
+        offline: Only answer from the cache, urls not cached are rejected.
+    """
+    max_hosts = 100
+    max_host_connections = 10
+    timeout = 60
+    max_body_size = 50 * 1024 * 1024
+    page_types = ('text/html', 'application/xhtml+xml', 'application/xml', 'text/xml',
+                  'text/plain')
+    chunk_size = 64 * 1024
+
+    def __init__(self, max_hosts=None, max_host_connections=None, timeout=None, headers=None,
+                 cache=None, max_body_size=None, page_types=None, metrics=None, offline=False):
+        self.max_hosts = int(max_hosts or self.max_hosts)
+        self.max_host_connections = int(max_host_connections or self.max_host_connections)
+        self.timeout = timeout or self.timeout
+        self.headers = dict(headers or {})
+        self.cache = cache
+        self.max_body_size = int(max_body_size or self.max_body_size)
+        self.page_types = tuple(page_types or self.page_types)
+        self.metrics = metrics
+        self.offline = offline
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, url, content_types=None, out=None, **kwds):
+        """Returns the response of url with its body streamed in up to max_body_size.
+
+        RejectedResponse is raised for bodies larger than that and, if content_types are given,
+        for responses whose content type starts with none of them. With out the body is written
+        to that file object instead of being kept in the response, bypassing the cache.
+        """
+        try:
+            return self._get(url, content_types, out, **kwds)
+        except Exception as e:
+            if self.metrics is not None:
+                domain = urlsplit(url).netloc
+                self.metrics.incr('errors', domain=domain, error=type(e).__name__)
+            raise
+
+    def _get(self, url, content_types=None, out=None, **kwds):
+        kwds.setdefault('timeout', self.timeout)
+        kwds['stream'] = True
+        if self.cache is None or out is not None:
+            return self._read(self._request(url, **kwds), content_types, out)
+        if self.offline:
+            cached = self.cache.get(url)
+            if cached is None:
+                raise RejectedResponse('%s is not cached' % url)
+            return cached
+        validators = self.cache.get_validators(url)
+        if validators:
+            kwds['headers'] = dict(validators, **kwds.get('headers', {}))
+        response = self._request(url, **kwds)
+        # the cached body is only read if it is still valid
+        cached = self.cache.get(url) if response.status_code == 304 and validators else None
+        if cached is not None:
+            response.close()
+            return cached
+        response = self._read(response, content_types)
+        if response.status_code == 200:
+            self.cache.set(url, response)
+        return response
+
+    def get_page(self, url, **kwds):
+        """Returns the response of a page to extract, error pages and other types are rejected."""
+        response = self.get(url, content_types=self.page_types, **kwds)
+        if response.status_code >= 400:
+            raise RejectedResponse('%s answered %d' % (url, response.status_code))
+        return response
+
+    def _request(self, url, **kwds):
+        start = monotonic()
+        response = self.get_session(url).get(url, **kwds)
+        if self.metrics is not None:
+            self.metrics.observe('fetch_headers_seconds', monotonic() - start)
+            domain = urlsplit(url).netloc
+            self.metrics.incr('requests', domain=domain)
+            if response.status_code >= 400:
+                self.metrics.incr('errors', domain=domain, error=str(response.status_code))
+        return response
+
+    def _read(self, response, content_types=None, out=None):
+        start = monotonic()
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_types and content_type and not content_type.startswith(tuple(content_types)):
+            response.close()
+            raise RejectedResponse('%s has content type %s' % (response.url, content_type))
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > self.max_body_size:
+            response.close()
+            raise RejectedResponse('%s has %s bytes' % (response.url, length))
+        # chunks are decoded incrementally, so the limit holds for compressed bodies too
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(self.chunk_size):
+            size += len(chunk)
+            if size > self.max_body_size:
+                break
+            if out is None:
+                chunks.append(chunk)
+            else:
+                out.write(chunk)
+        response._content = b''.join(chunks)
+        response._content_consumed = True
+        response.close()
+        if self.metrics is not None:
+            self.metrics.observe('fetch_body_seconds', monotonic() - start)
+            self.metrics.incr('bytes_in', min(size, self.max_body_size))
+        if size > self.max_body_size:
+            raise RejectedResponse('%s has more than %d bytes' % (response.url,
+                                                                  self.max_body_size))
+        return response
+
+    def get_session(self, url):
+        parts = urlsplit(url)
+        host = (parts.scheme, parts.netloc)
+        with self._lock:
+            session = self._sessions.pop(host, None) or self._create_session()
+            # reinsert to keep the most recently used host last
+            self._sessions[host] = session
+            while len(self._sessions) > self.max_hosts:
+                self._sessions.popitem(last=False)[1].close()
+        return session
+
+    def _create_session(self):
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_host_connections,
+                              pool_block=True)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        with self._lock:
+            while self._sessions:
+                self._sessions.popitem()[1].close()
@@ -0,0 +1,56 @@
+import time
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from .utils import SqliteFile, json
+
+
+class HttpCache(SqliteFile):
+    """Sqlite file keeping the last successful response of every url with its validators.
+
+    Fetcher sends the ETag and Last-Modified of a cached response as If-None-Match and
+    If-Modified-Since, a 304 answer is replaced by the cached response. Its body is only read
+    from the file then.
+    """
+    def __init__(self, path):
+        super().__init__(path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, '
+                        'status INTEGER, headers TEXT, content BLOB, fetched REAL)')
+
+    def get(self, url):
+        """Returns the cached response of url marked with from_cache or None."""
+        with self._lock:
+            row = self.db.execute('SELECT status, headers, content FROM responses WHERE url = ?',
+                                  (url,)).fetchone()
+        if row is None:
+            return None
+        response = Response()
+        response.url = url
+        response.status_code = row[0]
+        response.headers = CaseInsensitiveDict(json.loads(row[1]))
+        response._content = bytes(row[2])
+        response.from_cache = True
+        return response
+
+    def set(self, url, response):
+        headers = json.dumps(dict(response.headers))
+        with self._lock:
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                            (url, response.status_code, headers, response.content, time.time()))
+            self.db.commit()
+
+    def get_validators(self, url):
+        """Returns the conditional request headers revalidating the cached response of url."""
+        with self._lock:
+            row = self.db.execute('SELECT headers FROM responses WHERE url = ?',
+                                  (url,)).fetchone()
+        if row is None:
+            return {}
+        cached = CaseInsensitiveDict(json.loads(row[0]))
+        headers = {}
+        if 'ETag' in cached:
+            headers['If-None-Match'] = cached['ETag']
+        if 'Last-Modified' in cached:
+            headers['If-Modified-Since'] = cached['Last-Modified']
+        return headers
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+from hashlib import sha1
+from threading import Lock
+
+
+class ImageFileStore(object):
+    """Directory keeping downloaded images once per content.
+
+    Every image is streamed to a temporary file while hashing it and then kept as
+    <sha1[:2]>/<sha1>/<file name>, the relative path is the reference put into the records. The
+    same content under another file name gets hardlinked instead of stored again.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = os.path.join(path, 'tmp')
+        os.makedirs(self.tmp_path, exist_ok=True)
+        self._lock = Lock()
+
+    def download(self, fetcher, url, name):
+        """Downloads url with fetcher and returns the reference of the stored file.
+
+        Error responses raise a requests.HTTPError, which is an IOError, and store nothing.
+        """
+        fd, tmp_file = tempfile.mkstemp(dir=self.tmp_path)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                out = HashingWriter(tmp)
+                fetcher.get(url, out=out).raise_for_status()
+            return self.add(tmp_file, out.hash.hexdigest(), name or 'image')
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def add(self, tmp_file, digest, name):
+        """Moves tmp_file into the store unless its content is already there."""
+        directory = os.path.join(digest[:2], digest)
+        reference = os.path.join(directory, name)
+        path = os.path.join(self.path, reference)
+        with self._lock:
+            if os.path.exists(path):
+                return reference
+            directory = os.path.join(self.path, directory)
+            existing = os.listdir(directory) if os.path.isdir(directory) else ()
+            if not existing:
+                os.makedirs(directory, exist_ok=True)
+                os.replace(tmp_file, path)
+                return reference
+            try:
+                os.link(os.path.join(directory, existing[0]), path)
+            except OSError:
+                shutil.copyfile(os.path.join(directory, existing[0]), path)
+        return reference
+
+    def get_path(self, reference):
+        return os.path.join(self.path, reference)
+
+
+class HashingWriter(object):
+    """File wrapper hashing all data written to it."""
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hash = sha1()
+
+    def write(self, data):
+        self.hash.update(data)
+        return self.fileobj.write(data)
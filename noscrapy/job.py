@@ -1,8 +1,6 @@
 from urllib.parse import urljoin
 
-import requests
-
-from .sitemap import Sitemap
+from .utils import parse_count
 
 
 class Job(object):
@@ -15,19 +13,35 @@ class Job(object):
         self.scraper = scraper
         self.data_items = []
         self.base_data = base_data or {}
+        self.parse_count = 0
+        self.from_cache = False
+        self.unchanged = False
 
     def combine_urls(self, parent_url, child_url):
         return urljoin(parent_url, child_url)
 
     def execute(self):
-        sitemap = Sitemap(self.scraper.sitemap, parent_id=self.parent_id)
-        response = requests.get(self.url)
-        sitemap.parent_item = response.content
-        sitemap_data = list(sitemap.get_data())
+        self.parse(self.fetch())
+
+    def fetch(self):
+        """Returns the raw page content, this is the only part of a job waiting on the network."""
+        response = self.scraper.fetcher.get_page(self.url)
+        self.from_cache = getattr(response, 'from_cache', False)
+        return response.content
+
+    def parse(self, content):
+        """Extracts the records from fetched content, this is the cpu bound part of a job."""
+        parses = parse_count()
+        records = self.scraper.extract(self, content)
+        self.add_results(records, parse_count() - parses)
+
+    def add_results(self, records, parses=1):
+        """Adds the records extracted from the page of this job, possibly in another process."""
         # merge data with data from initialization
-        for result in sitemap_data:
+        for result in records:
             result.update(result, **self.base_data)
             self.data_items.append(result)
+        self.parse_count = parses
 
     def get_results(self):
         return self.data_items
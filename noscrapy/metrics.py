@@ -0,0 +1,243 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+
+from .utils import json
+
+logger = logging.getLogger('noscrapy')
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram(object):
+    """Counts of observed values per bucket, with their count and sum."""
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket holding the q quantile, inf above the last."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+    def get_state(self):
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5),
+                'p99': self.quantile(0.99)}
+
+
+class Metrics(object):
+    """Thread safe counters, gauges and latency histograms of a crawl.
+
+    Values are kept by name and optional labels like domain or selector. Every interval seconds
+    report() gets called by the scraper, which passes a snapshot to all sinks.
+
+        sinks: Objects with write(metrics) and close(), eg. LogSink, JsonFileSink, PrometheusSink.
+        interval: Seconds between two reports.
+    """
+    interval = 10
+
+    def __init__(self, sinks=(), interval=None):
+        self.sinks = list(sinks)
+        self.interval = self.interval if interval is None else interval
+        self.started = time.monotonic()
+        self.reported = self.started
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = Lock()
+        for sink in self.sinks:
+            if hasattr(sink, 'start'):
+                sink.start(self)
+
+    def incr(self, name, value=1, **labels):
+        key = name, tuple(sorted(labels.items()))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = name, tuple(sorted(labels.items()))
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name, seconds, **labels):
+        key = name, tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, name, **labels):
+        return Timer(self, name, labels)
+
+    def get_selector_data(self, selector, parent_item):
+        """Sitemap.get_data observer measuring the extraction time per selector."""
+        with self.timer('selector_seconds', selector=selector.id):
+            return list(selector.get_data(parent_item))
+
+    def is_due(self):
+        return time.monotonic() - self.reported >= self.interval
+
+    def report(self):
+        self.reported = time.monotonic()
+        for sink in self.sinks:
+            sink.write(self)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def get_rate(self, name):
+        """Returns the per second rate of a gauge or counter since the start."""
+        elapsed = time.monotonic() - self.started
+        value = self.gauges.get((name, ()), self.counters.get((name, ()), 0))
+        return value / elapsed if elapsed > 0 else 0
+
+    def snapshot(self):
+        """Returns all values as json serialisable dict, labels are joined into the keys."""
+        with self._lock:
+            return {
+                'seconds': time.monotonic() - self.started,
+                'pages_per_second': self.get_rate('pages'),
+                'records_per_second': self.get_rate('records'),
+                'counters': {format_key(k): v for k, v in self.counters.items()},
+                'gauges': {format_key(k): v for k, v in self.gauges.items()},
+                'histograms': {format_key(k): h.get_state() for k, h in self.histograms.items()},
+            }
+
+    def render_prometheus(self, prefix='noscrapy_'):
+        """Returns all values in the prometheus text format."""
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append('%s%s_total%s %s' % (prefix, name, format_labels(labels), value))
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append('%s%s%s %s' % (prefix, name, format_labels(labels), value))
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                seen = 0
+                bounds = histogram.buckets + ('+Inf',)
+                for bound, count in zip(bounds, histogram.counts):
+                    seen += count
+                    bucket_labels = format_labels(labels + (('le', bound),))
+                    lines.append('%s%s_bucket%s %d' % (prefix, name, bucket_labels, seen))
+                lines.append('%s%s_sum%s %s' % (prefix, name, format_labels(labels),
+                                                histogram.sum))
+                lines.append('%s%s_count%s %d' % (prefix, name, format_labels(labels),
+                                                  histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+class Timer(object):
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.monotonic() - self.start
+        self.metrics.observe(self.name, self.seconds, **self.labels)
+
+
+def format_key(key):
+    name, labels = key
+    return name + ''.join(',%s=%s' % label for label in labels)
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (k, str(v).replace('"', '\\"')) for k, v in labels)
+
+
+class LogSink(object):
+    """Logs one line with the crawl rates, queue and latency percentiles."""
+    def __init__(self, log=logger, level=logging.INFO):
+        self.log = log
+        self.level = level
+
+    def write(self, metrics):
+        state = metrics.snapshot()
+        parts = ['%.1f pages/s' % state['pages_per_second'],
+                 '%.1f records/s' % state['records_per_second']]
+        for name in ('pages', 'records', 'queue_depth', 'seen'):
+            if name in state['gauges']:
+                parts.append('%s=%s' % (name, state['gauges'][name]))
+        for name, histogram in sorted(state['histograms'].items()):
+            if ',' not in name:
+                parts.append('%s p50=%s p99=%s' % (name, histogram['p50'], histogram['p99']))
+        self.log.log(self.level, ' '.join(parts))
+
+    def close(self):
+        pass
+
+
+class JsonFileSink(object):
+    """Replaces a json file with the latest snapshot on every report."""
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, metrics):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(metrics.snapshot(), f)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        pass
+
+
+class PrometheusSink(object):
+    """Serves the metrics in the prometheus text format on http://host:port/metrics."""
+    def __init__(self, port=9100, host='127.0.0.1'):
+        self.address = host, port
+        self.server = None
+
+    def start(self, metrics):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(self.address, Handler)
+        self.address = self.server.server_address
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def write(self, metrics):
+        # scraped on request
+        pass
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
@@ -0,0 +1,27 @@
+from .utils import SqliteFile, json
+
+
+class PageStore(SqliteFile):
+    """Sqlite file keeping the records extracted from every page by a digest of its content.
+
+    Records are kept as extracted, with their follow links, so a page with the same digest in a
+    later crawl can be re-emitted and followed without running the selectors again.
+    """
+    def __init__(self, path):
+        super().__init__(path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS pages (url TEXT, parent_id TEXT, '
+                        'digest TEXT, records TEXT, PRIMARY KEY (url, parent_id))')
+
+    def get(self, url, parent_id, digest):
+        """Returns the records of the page if its digest is unchanged or None."""
+        with self._lock:
+            row = self.db.execute('SELECT records FROM pages WHERE url = ? AND parent_id = ? '
+                                  'AND digest = ?', (url, parent_id, digest)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, url, parent_id, digest, records):
+        records = json.dumps(records)
+        with self._lock:
+            self.db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)',
+                            (url, parent_id, digest, records))
+            self.db.commit()
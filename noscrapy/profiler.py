@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from threading import Lock
+from time import perf_counter
+
+from .sitemap import Sitemap
+
+COLUMNS = 'selector', 'calls', 'nodes', 'records', 'seconds', 'items_seconds', 'data_seconds'
+
+class Profiler(object):
+    """Sitemap.get_data observer summing up the work of every selector by its id.
+
+    Per selector it counts the calls, the nodes matched by get_items and the records produced, and
+    measures the total time with the parts spent matching items and extracting their data. The
+    time spent in _find_trees is measured by profile_trees.
+    """
+    def __init__(self):
+        self.selectors = OrderedDict()
+        self.trees_seconds = 0
+        self._lock = Lock()
+
+    def _add(self, selector_id, **values):
+        with self._lock:
+            profile = self.selectors.get(selector_id)
+            if profile is None:
+                profile = self.selectors[selector_id] = dict.fromkeys(COLUMNS[1:], 0)
+            for key, value in values.items():
+                profile[key] += value
+
+    def get_selector_data(self, selector, parent_item):
+        start = perf_counter()
+        records = list(selector.get_data(parent_item, self))
+        self._add(selector.id, calls=1, records=len(records), seconds=perf_counter() - start)
+        return records
+
+    def observe_items(self, selector, items):
+        items = iter(items)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                self._add(selector.id, items_seconds=perf_counter() - start)
+                return
+            self._add(selector.id, nodes=1, items_seconds=perf_counter() - start)
+            yield item
+
+    def observe_item_data(self, selector, get_item_data):
+        def profiled_get_item_data(item):
+            start = perf_counter()
+            results = list(get_item_data(item))
+            self._add(selector.id, data_seconds=perf_counter() - start)
+            return results
+        return profiled_get_item_data
+
+    def profile_trees(self, sitemap):
+        """Finds the selector trees of every page type of sitemap and returns the seconds."""
+        parent_ids = ['_root'] + [s.id for s in sitemap if s.can_create_new_jobs]
+        start = perf_counter()
+        for parent_id in parent_ids:
+            Sitemap(sitemap, parent_id=parent_id).trees
+        seconds = perf_counter() - start
+        self.trees_seconds += seconds
+        return seconds
+
+    def get_report(self):
+        """Returns a row per selector with COLUMNS, the slowest first."""
+        with self._lock:
+            rows = [dict(profile, selector=selector_id)
+                    for selector_id, profile in self.selectors.items()]
+        return sorted(rows, key=lambda row: row['seconds'], reverse=True)
+
+    def format_report(self):
+        lines = ['%-20s %8s %8s %8s %10s %14s %14s' % COLUMNS]
+        for row in self.get_report():
+            lines.append('%-20s %8d %8d %8d %10.4f %14.4f %14.4f' % tuple(
+                row[column] for column in COLUMNS))
+        lines.append('_find_trees %.4f seconds' % self.trees_seconds)
+        return '\n'.join(lines)
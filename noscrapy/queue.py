@@ -1,11 +1,22 @@
 import re
+import sqlite3
+import time
+from collections import deque
+
+from .job import Job
+from .utils import FingerprintSet, fingerprint, json
 
 DOCUMENT_RE = re.compile(r'.*?\.(doc|docx|pdf|ppt|pptx|odt)$', 2)
 
 class Queue(object):
-    def __init__(self):
-        self.jobs = []
-        self.scraped_urls = {}
+    """FIFO queue of jobs, every url gets only queued once.
+
+        seen: Set like container for the queued urls, eg. a BloomFilter for a fixed memory size.
+              Defaults to a FingerprintSet.
+    """
+    def __init__(self, seen=None):
+        self.jobs = deque()
+        self.scraped_urls = FingerprintSet() if seen is None else seen
 
     def add(self, job):
         """Returns false if page is already scraped."""
@@ -26,15 +37,148 @@ class Queue(object):
     def get_queue_size(self):
         return len(self.jobs)
 
+    def get_seen_size(self):
+        return len(self.scraped_urls)
+
     def is_scraped(self, url):
         return url in self.scraped_urls
 
     def _set_url_scraped(self, url):
-        self.scraped_urls[url] = True
+        self.scraped_urls.add(url)
 
     def get_next_job(self):
-        # TODO: test this
         if self.jobs:
-            return self.jobs.pop(0)
+            return self.jobs.popleft()
         else:
             return False
+
+    def task_done(self, job):
+        """Marks a job returned by get_next_job as completely processed."""
+        pass
+
+    def renew(self, jobs):
+        """Tells the queue that jobs returned by get_next_job are still processed."""
+        pass
+
+    def is_finished(self):
+        """Returns true if no job is queued or processed anymore, also not by other workers."""
+        return not self.jobs
+
+    def close(self):
+        pass
+
+
+class SqliteQueue(Queue):
+    """Queue persisting pending jobs and seen urls in a sqlite file, so a crawl can be resumed.
+
+    A job stays in the file until task_done is called for it, jobs which were running when the
+    crawl died are handed out again after reopening the file. Urls added while a job was processed
+    get committed together with its completion.
+
+    With a worker name the file is a frontier shared by several workers, which lease their jobs
+    for lease_timeout seconds. Leases of crashed workers expire and get handed out again, every
+    change is committed at once so the other workers see it. Leases of jobs still processed are
+    renewed when a quarter of lease_timeout passed since the last renewal.
+    """
+    lease_timeout = 600
+
+    def __init__(self, path, worker=None, lease_timeout=None):
+        self.path = path
+        self.worker = worker
+        self.lease_timeout = float(lease_timeout or self.lease_timeout)
+        self._renewed = time.time()
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                        'url TEXT, parent_id TEXT, base_data TEXT, running INTEGER DEFAULT 0, '
+                        'worker TEXT, expires REAL)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS seen (fingerprint INTEGER PRIMARY KEY)')
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(jobs)')]
+        for column in ('worker TEXT', 'expires REAL'):
+            if column.split()[0] not in columns:
+                self.db.execute('ALTER TABLE jobs ADD COLUMN ' + column)
+        if worker is None:
+            self.db.execute('UPDATE jobs SET running = 0')
+        self.db.commit()
+
+    def add(self, job):
+        if not self.can_be_added(job):
+            return False
+        if self.worker is not None:
+            # another worker may add the same url between the check and the insert
+            self.db.commit()
+            self.db.execute('BEGIN IMMEDIATE')
+        added = self._set_url_scraped(job.url)
+        if added:
+            self.db.execute('INSERT INTO jobs (url, parent_id, base_data) VALUES (?, ?, ?)',
+                            (job.url, job.parent_id, json.dumps(job.base_data)))
+        if self.worker is not None:
+            self.db.commit()
+        return added
+
+    def get_queue_size(self):
+        query = 'SELECT COUNT(*) FROM jobs WHERE running = 0 OR expires < ?'
+        return self.db.execute(query, (self._get_now(),)).fetchone()[0]
+
+    def get_seen_size(self):
+        return self.db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def is_scraped(self, url):
+        query = 'SELECT 1 FROM seen WHERE fingerprint = ?'
+        return self.db.execute(query, (self._fingerprint(url),)).fetchone() is not None
+
+    def _set_url_scraped(self, url):
+        """Returns false if the url was already seen."""
+        cursor = self.db.execute('INSERT OR IGNORE INTO seen VALUES (?)', (self._fingerprint(url),))
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def _fingerprint(url):
+        # sqlite integers are signed 64 bit
+        return fingerprint(url) >> 1
+
+    def _get_now(self):
+        # without a worker nobody else can hold a lease, expired ones are only reset on opening
+        return time.time() if self.worker is not None else float('-inf')
+
+    def get_next_job(self):
+        if self.worker is not None:
+            # lock the file for writing so no other worker leases the same job
+            self.db.commit()
+            self.db.execute('BEGIN IMMEDIATE')
+        now = self._get_now()
+        row = self.db.execute('SELECT id, url, parent_id, base_data FROM jobs '
+                              'WHERE running = 0 OR expires < ? ORDER BY id LIMIT 1',
+                              (now,)).fetchone()
+        if row:
+            self.db.execute('UPDATE jobs SET running = 1, worker = ?, expires = ? WHERE id = ?',
+                            (self.worker, time.time() + self.lease_timeout, row[0]))
+        if self.worker is not None:
+            self.db.commit()
+        if not row:
+            return False
+        job = Job(row[1], row[2], base_data=json.loads(row[3]))
+        job.queue_id = row[0]
+        return job
+
+    def task_done(self, job):
+        self.db.execute('DELETE FROM jobs WHERE id = ?', (job.queue_id,))
+        self.db.commit()
+
+    def renew(self, jobs):
+        now = time.time()
+        if self.worker is None or now < self._renewed + self.lease_timeout / 4:
+            return
+        self._renewed = now
+        self.db.executemany('UPDATE jobs SET expires = ? WHERE id = ? AND worker = ?',
+                            [(now + self.lease_timeout, job.queue_id, self.worker)
+                             for job in jobs])
+        self.db.commit()
+
+    def is_finished(self):
+        return self.db.execute('SELECT 1 FROM jobs LIMIT 1').fetchone() is None
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
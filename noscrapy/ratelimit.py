@@ -0,0 +1,50 @@
+import time
+from threading import Lock
+from urllib.parse import urlsplit
+
+
+class RateLimiter(object):
+    """Spaces out the requests to every host without waiting itself.
+
+    A request reserves the next free slot of its host and gets the seconds to wait for it, so
+    callers can work on other hosts meanwhile.
+
+        interval: Minimal seconds between the starts of two requests to a host.
+        max_hosts: Number of hosts after which the ones without a future slot are forgotten.
+    """
+    max_hosts = 1000
+
+    def __init__(self, interval=0, max_hosts=None, clock=time.monotonic):
+        self.interval = interval
+        self.max_hosts = int(max_hosts or self.max_hosts)
+        self.clock = clock
+        self._slots = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def get_host(url):
+        return urlsplit(url).netloc.lower()
+
+    def reserve(self, url):
+        """Reserves the next slot of the host of url and returns the seconds until it starts."""
+        host = self.get_host(url)
+        with self._lock:
+            now = self.clock()
+            start = max(now, self._slots.get(host, now))
+            self._slots[host] = start + self.interval
+            if len(self._slots) > self.max_hosts:
+                self._forget(now)
+        return start - now
+
+    def pause(self, url, seconds):
+        """Keeps the next slot of the host of url at least seconds from now."""
+        if seconds <= 0:
+            return
+        host = self.get_host(url)
+        with self._lock:
+            until = self.clock() + seconds
+            self._slots[host] = max(self._slots.get(host, until), until)
+
+    def _forget(self, now):
+        for host in [h for h, start in self._slots.items() if start <= now]:
+            del self._slots[host]
@@ -0,0 +1,268 @@
+import gzip
+import mimetypes
+import os
+import random
+import time
+from collections import Counter, namedtuple
+from http.server import BaseHTTPRequestHandler
+from threading import BoundedSemaphore, Lock, Thread
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from .fetcher import Fetcher
+from .metrics import ThreadingHTTPServer
+
+URL_HEADER = 'X-Replay-Url'
+HOP_HEADERS = ('connection', 'content-length', 'keep-alive', 'transfer-encoding')
+
+Recorded = namedtuple('Recorded', 'status headers body')
+
+
+class DirectoryCorpus(object):
+    """Recorded pages as files at <path>/<host>/<path of the url>.
+
+    Urls ending with a slash are read from index.html in their directory, a query is appended to
+    the file name with its question mark. The content type is guessed from the file name.
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def get_file(self, url):
+        parts = urlsplit(url)
+        name = parts.path.lstrip('/')
+        if not name or name.endswith('/'):
+            name += 'index.html'
+        if parts.query:
+            name += '?' + parts.query
+        path = os.path.normpath(os.path.join(self.path, parts.netloc, name))
+        if not path.startswith(self.path + os.sep):
+            return None
+        return path
+
+    def get(self, url):
+        path = self.get_file(url)
+        if path is None or not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(path.split('?')[0])[0] or 'text/html'
+        return Recorded(200, {'Content-Type': content_type}, body)
+
+
+class WarcCorpus(object):
+    """Responses of a WARC file, gzip compressed ones end with .gz. All are kept in memory."""
+    def __init__(self, path):
+        self.path = path
+        self.responses = {}
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            for headers, block in read_warc(f):
+                if headers.get('warc-type') == 'response' and 'warc-target-uri' in headers:
+                    url = headers['warc-target-uri'].strip('<>')
+                    self.responses[url] = parse_http_response(block)
+
+    def get(self, url):
+        return self.responses.get(url)
+
+def open_corpus(path):
+    """Returns the corpus of a directory or WARC file."""
+    if os.path.isdir(path):
+        return DirectoryCorpus(path)
+    return WarcCorpus(path)
+
+def read_warc(f):
+    """Yields the headers with lower case names and the block of every record of a WARC file."""
+    while True:
+        line = f.readline()
+        if not line:
+            return
+        if not line.strip():
+            continue
+        if not line.startswith(b'WARC/'):
+            raise ValueError('no WARC record at %r' % line[:50])
+        headers = read_headers(f)
+        yield headers, f.read(int(headers.get('content-length', 0)))
+
+def read_headers(f):
+    headers = {}
+    for line in iter(f.readline, b''):
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+def parse_http_response(block):
+    """Returns the Recorded of a raw http response, chunked bodies are joined."""
+    head, _, body = block.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip()] = value.strip()
+    if headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        body = read_chunked(body)
+    headers = {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+    return Recorded(status, headers, body)
+
+def read_chunked(body):
+    chunks = []
+    while body:
+        size, _, body = body.partition(b'\r\n')
+        size = int(size.split(b';')[0], 16)
+        if not size:
+            break
+        chunks.append(body[:size])
+        body = body[size + 2:]
+    return b''.join(chunks)
+
+
+class ReplayServer(object):
+    """Local http server answering requests of a ReplayFetcher with the responses of a corpus.
+
+        corpus: DirectoryCorpus, WarcCorpus or any mapping of urls to Recorded responses.
+        latency: Seconds waited before the headers of every response are sent.
+        bandwidth: Bytes per second a response body is sent with, unlimited if not given.
+        error_rate: Fraction of the requests answered with a 503 error instead.
+        host_concurrency: Requests per host answered at once, further ones wait for a free slot.
+        seed: Seed of the random errors, to get the same errors in every run.
+
+    Urls missing in the corpus are answered with 404. stats counts the requests, errors, missing
+    urls and sent bytes.
+    """
+    chunk_size = 16 * 1024
+
+    def __init__(self, corpus, latency=0, bandwidth=None, error_rate=0, host_concurrency=None,
+                 seed=None, host='127.0.0.1', port=0):
+        self.corpus = corpus
+        self.latency = latency or 0
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate or 0
+        self.host_concurrency = host_concurrency
+        self.address = host, port
+        self.stats = Counter()
+        self.server = None
+        self._random = random.Random(seed)
+        self._slots = {}
+        self._lock = Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body are separate writes, which would wait for a delayed ack
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = self.headers.get(URL_HEADER) or self.path
+                if not urlsplit(url).netloc:
+                    url = 'http://%s%s' % (self.headers.get('Host', ''), self.path)
+                replay.respond(self, url)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(self.address, Handler)
+        self.address = self.server.server_address
+        Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def get_slot(self, host):
+        with self._lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                slot = self._slots[host] = BoundedSemaphore(self.host_concurrency)
+            return slot
+
+    def is_error(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.stats[name] += value
+
+    def respond(self, handler, url):
+        if self.host_concurrency:
+            with self.get_slot(urlsplit(url).netloc):
+                self._respond(handler, url)
+        else:
+            self._respond(handler, url)
+
+    def _respond(self, handler, url):
+        self.count('requests')
+        if self.latency:
+            time.sleep(self.latency)
+        if self.is_error():
+            self.count('errors')
+            recorded = Recorded(503, {'Content-Type': 'text/plain'}, b'replayed error')
+        else:
+            recorded = self.corpus.get(url)
+        if recorded is None:
+            self.count('missing')
+            recorded = Recorded(404, {'Content-Type': 'text/plain'}, b'not recorded')
+        handler.send_response(recorded.status)
+        for name, value in recorded.headers.items():
+            if name.lower() not in HOP_HEADERS:
+                handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(recorded.body)))
+        handler.end_headers()
+        self.send_body(handler.wfile, recorded.body)
+
+    def send_body(self, out, body):
+        if not self.bandwidth:
+            out.write(body)
+        else:
+            for start in range(0, len(body), self.chunk_size):
+                chunk = body[start:start + self.chunk_size]
+                time.sleep(len(chunk) / self.bandwidth)
+                out.write(chunk)
+        self.count('bytes_out', len(body))
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Transport adapter sending all requests to a ReplayServer with their url in a header."""
+    def __init__(self, address, **kwds):
+        super().__init__(**kwds)
+        self.server_url = 'http://%s:%d/' % address
+
+    def send(self, request, **kwds):
+        url = request.url
+        request = request.copy()
+        request.headers[URL_HEADER] = url
+        request.url = self.server_url
+        response = super().send(request, **kwds)
+        response.url = url
+        return response
+
+
+class ReplayFetcher(Fetcher):
+    """Fetcher getting every url from the ReplayServer at address instead of its host."""
+    def __init__(self, address, **kwds):
+        super().__init__(**kwds)
+        self.address = address
+
+    def _create_session(self):
+        session = super()._create_session()
+        # proxies of the environment would be asked for the local server
+        session.trust_env = False
+        adapter = ReplayAdapter(self.address, pool_connections=1,
+                                pool_maxsize=self.max_host_connections, pool_block=True)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
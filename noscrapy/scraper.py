@@ -1,34 +1,263 @@
-from noscrapy import Job
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from hashlib import sha1
+from time import sleep
+from urllib.parse import urljoin
 
+from noscrapy import Fetcher, Job
+from noscrapy.fetcher import RejectedResponse
+from noscrapy.metrics import Metrics
+from noscrapy.ratelimit import RateLimiter
+from noscrapy.utils import compile_css, json
+from noscrapy.workers import build_plan, extract, parse_in_worker
+
+logger = logging.getLogger('noscrapy')
 
 class Scraper(object):
+    """Crawls the jobs of the queue one after another.
+
+        request_interval: Minimal milliseconds between two requests to the same host.
+        pageload_delay: Milliseconds a host is left alone after one of its pages was loaded.
+
+    The delay of the selectors extracting a page is added to the pageload_delay of its host.
+    Without delays both are ignored, eg. for pages read from a cache.
+    When the queue is shared with other workers, the scraper waits poll_interval seconds for new
+    jobs as long as the other workers still process some.
+
+    With a PageStore as pages, the records of a page with unchanged content and sitemap are taken
+    from the last crawl instead of being extracted again.
+
+    Images of ImageSelectors with download_image are downloaded once per url by `image_workers`
+    threads into the ImageFileStore images, records are saved when their images are stored.
+    Image requests keep the request_interval of their host, no further job is started while
+    `max_pending_images` downloads wait. The last `max_image_urls` urls are remembered.
+
+    Fetch, parse and store write latencies go to metrics, which gets the stats, queue depth and
+    seen urls and reports to its sinks every metrics.interval seconds. Selector calls are only
+    timed with a Sitemap.get_data observer, like the metrics or a Profiler, as it slows down the
+    extraction.
+
+    With max_pages the crawl stops after that many jobs were started.
+    """
     request_interval = 2000
-    _time_next_scrape_available = 0
+    pageload_delay = 0
+    poll_interval = 1
+    image_workers = 4
+    max_pending_images = 100
+    max_image_urls = 100000
+    delays = True
 
-    def __init__(self, queue, sitemap, store, request_interval=None, pageload_delay=None):
+    def __init__(self, queue, sitemap, store, request_interval=None, pageload_delay=None,
+                 fetcher=None, pages=None, images=None, image_workers=None, metrics=None,
+                 observer=None, max_pages=None, delays=None):
         self.queue = queue
         self.sitemap = sitemap
         self.store = store
-        self.request_interval = int(request_interval or self.request_interval)
-        self.pageload_delay = int(pageload_delay or 0)
+        self.metrics = metrics or Metrics()
+        self.observer = observer
+        self.max_pages = max_pages
+        self._started_jobs = 0
+        self.fetcher = fetcher or Fetcher(metrics=self.metrics)
+        self.pages = pages
+        self.images = images
+        self.image_workers = int(image_workers or self.image_workers)
+        self._image_pool = None
+        self._image_downloads = OrderedDict()
+        self._image_backlog = []
+        self._waiting_jobs = []
+        self._sitemap_json = None
+        self.stats = Counter()
+        self._plans = {}
+        self._delays = {}
+        self._records = None
+        self._finished_jobs = []
+        self._held_jobs = set()
+        if request_interval is not None:
+            self.request_interval = int(request_interval)
+        if pageload_delay is not None:
+            self.pageload_delay = int(pageload_delay)
+        if delays is not None:
+            self.delays = delays
+        self.limiter = RateLimiter(self.request_interval / 1000)
 
     def run(self):
-        self.init_first_jobs()
-        while True:
-            job = self.queue.get_next_job()
-            if not job:
-                break
-            self._run_job(job)
+        try:
+            self.init_first_jobs()
+            while True:
+                self.queue.renew(self._held_jobs)
+                self._wait_for_images()
+                job = self.get_next_job()
+                if job:
+                    self._run_job(job)
+                elif self.is_finished():
+                    break
+                else:
+                    sleep(self.poll_interval)
+        finally:
+            self.flush()
+            self.close()
+            self.report_metrics(force=True)
+
+    def report_metrics(self, force=False):
+        """Sets the crawl gauges and reports the metrics if their interval is over."""
+        if not force and not self.metrics.is_due():
+            return
+        for name, value in self.get_stats().items():
+            self.metrics.set(name, value)
+        self.metrics.set('queue_depth', self.queue.get_queue_size())
+        self.metrics.set('seen', self.queue.get_seen_size())
+        self.metrics.report()
+
+    def close(self):
+        if self._image_pool is not None:
+            self._image_pool.shutdown()
+            self._image_pool = None
+
+    def is_finished(self):
+        """Returns true if there is no job left, own processed jobs are marked done before."""
+        self.flush()
+        return self._is_crawl_done()
+
+    def _is_crawl_done(self):
+        return self._is_page_limit_reached() or self.queue.is_finished()
+
+    def _is_page_limit_reached(self):
+        return self.max_pages is not None and self._started_jobs >= self.max_pages
+
+    def get_records(self):
+        """Returns the store records of the sitemap, which buffer the saves of the crawl."""
+        if self._records is None:
+            self._records = self.store.get_sitemap_data(self.sitemap.id)
+            if getattr(self._records, 'on_flush', False) is None:
+                self._records.on_flush = self._on_records_flush
+        return self._records
+
+    def _on_records_flush(self, count, seconds):
+        self.metrics.observe('store_write_seconds', seconds)
+
+    def flush(self):
+        """Writes the buffered records and marks the jobs which produced them as done."""
+        self._save_downloaded(block=True)
+        if self._records is not None:
+            self._records.flush()
+        self._finish_jobs()
+
+    def _finish_jobs(self):
+        for job in self._finished_jobs:
+            self.queue.task_done(job)
+            self._held_jobs.discard(job)
+        self._finished_jobs = []
+
+    def get_plan(self, parent_id):
+        """Returns the sitemap used to extract all pages of parent_id.
+
+        It is built once per crawl and parent_id with its selector trees already found, every job
+        only adds the fetched page. Changes to the sitemap after the crawl started are ignored.
+        """
+        plan = self._plans.get(parent_id)
+        if plan is None:
+            plan = build_plan(self.sitemap, parent_id)
+            delays = [int(s.delay or 0) for tree in plan.trees for s in tree]
+            self._delays[parent_id] = max(delays, default=0)
+            self._plans[parent_id] = plan
+        return plan
+
+    def get_pageload_delay(self, job):
+        """Returns the seconds the host of job is left alone after its page was loaded."""
+        if not self.delays:
+            return 0
+        self.get_plan(job.parent_id)
+        return (self.pageload_delay + self._delays[job.parent_id]) / 1000
+
+    def extract(self, job, content):
+        """Returns the records of the page content of job."""
+        digest = self.get_page_digest(content)
+        records = self.get_known_records(job, digest)
+        if records is None:
+            plan = self.get_plan(job.parent_id)
+            with self.metrics.timer('parse_seconds'):
+                records = extract(plan, content, self.observer)
+            self.remember_records(job, digest, records)
+        return records
+
+    def get_page_digest(self, content):
+        """Returns the digest of page content and sitemap the pages are stored with."""
+        if self.pages is None:
+            return None
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return sha1(self._get_sitemap_json().encode('utf-8') + b'\0' + content).hexdigest()
+
+    def get_known_records(self, job, digest):
+        """Returns the records of the last crawl if the page of job is unchanged, else None."""
+        if digest is None:
+            return None
+        records = self.pages.get(job.url, job.parent_id, digest)
+        job.unchanged = records is not None
+        return records
+
+    def remember_records(self, job, digest, records):
+        if digest is not None:
+            self.pages.set(job.url, job.parent_id, digest, records)
+
+    def _get_sitemap_json(self):
+        if self._sitemap_json is None:
+            self._sitemap_json = json.dumps(self.sitemap)
+        return self._sitemap_json
+
+    def get_stats(self):
+        """Returns the crawl counters together with the process wide css cache counters."""
+        css_cache = compile_css.cache_info()
+        return dict(self.stats, css_cache_hits=css_cache.hits, css_cache_misses=css_cache.misses)
 
     def init_first_jobs(self):
         for url in self.sitemap.start_urls:
             first_job = Job(url, '_root', self)
             self.queue.add(first_job)
 
+    def get_next_job(self):
+        if self._is_page_limit_reached():
+            return False
+        job = self.queue.get_next_job()
+        if job:
+            self._started_jobs += 1
+            self._held_jobs.add(job)
+        # jobs restored from a persistent queue don't know their scraper
+        if job and job.scraper is None:
+            job.scraper = self
+        return job
+
     def _run_job(self, job):
-        job.execute()
-        scraped_records = self.store.get_sitemap_data(job.scraper.sitemap.id)
+        sleep(self.limiter.reserve(job.url))
+        content = self._fetch(job)
+        self.limiter.pause(job.url, self.get_pageload_delay(job))
+        if content is None:
+            self.stats['rejected_pages'] += 1
+        else:
+            job.parse(content)
+        self._save_job_results(job)
+
+    def _fetch(self, job):
+        """Returns the content of the page of job or None if it was rejected.
+
+        The rejection is counted by the caller, the AsyncScraper runs this in its fetch threads.
+        """
+        try:
+            return job.fetch()
+        except RejectedResponse:
+            return None
+
+    def _save_job_results(self, job):
+        self.stats['pages'] += 1
+        self.stats['parses'] += job.parse_count
+        self.stats['cached_pages'] += job.from_cache
+        self.stats['unchanged_pages'] += job.unchanged
+        records = []
         for record in job.get_results():
+            # follow records pass their images on to the records of the followed page
+            self._resolve_images(job, record)
             save = True
             if self.record_can_have_child_jobs(record):
                 follow_id = record.pop('_follow_id', None)
@@ -38,8 +267,95 @@ class Scraper(object):
                     self.queue.add(new_job)
                     save = False
             if save:
+                records.append(record)
+        downloads = [(record, column, self._download_image(url))
+                     for record in records for column, url in self._pop_images(record)]
+        self._waiting_jobs.append((job, records, downloads))
+        self._save_downloaded()
+        self.report_metrics()
+
+    def _save_downloaded(self, block=False):
+        """Saves the records of the jobs whose images are downloaded."""
+        if not self._waiting_jobs:
+            return
+        ready, waiting = [], []
+        for job, records, downloads in self._waiting_jobs:
+            if block:
+                wait([future for record, column, future in downloads])
+            elif not all(future.done() for record, column, future in downloads):
+                waiting.append((job, records, downloads))
+                continue
+            for record, column, future in downloads:
+                try:
+                    record[column] = future.result()
+                except IOError:
+                    self.stats['failed_images'] += 1
+                    record[column] = None
+            self.stats['records'] += len(records)
+            ready.append((job, records))
+        self._waiting_jobs = waiting
+        self._save_records(ready)
+
+    def _save_records(self, ready):
+        """Saves the records of the (job, records) pairs in ready."""
+        self._records_saved(*self._write_records(ready))
+
+    def _write_records(self, ready):
+        """Saves the records and returns their jobs and whether no record is buffered anymore."""
+        scraped_records = self.get_records()
+        for job, records in ready:
+            for record in records:
                 scraped_records.save(record)
-            break
+        return [job for job, records in ready], not scraped_records.pending
+
+    def _records_saved(self, jobs, written):
+        # a job is only done for the queue once its records are written
+        self._finished_jobs.extend(jobs)
+        if written:
+            self._finish_jobs()
+
+    @staticmethod
+    def _resolve_images(job, record):
+        """Makes the image urls of record absolute, they are relative to the page of job."""
+        for key in record:
+            if key.startswith('_image-'):
+                record[key] = urljoin(job.url, record[key])
+
+    def _pop_images(self, record):
+        """Yields the file columns of the images in record with their urls."""
+        for key in [key for key in record if key.startswith('_image-')]:
+            url = record.pop(key)
+            if self.images is not None:
+                yield key[len('_image-'):] + '-file', url
+
+    def _download_image(self, url):
+        """Returns the future of the stored file of url, every url is only downloaded once."""
+        future = self._image_downloads.get(url)
+        if future is None:
+            if self._image_pool is None:
+                self._image_pool = ThreadPoolExecutor(self.image_workers)
+            future = self._image_pool.submit(self._store_image, url)
+            self._image_downloads[url] = future
+            if len(self._image_downloads) > self.max_image_urls:
+                self._image_downloads.popitem(last=False)
+            self._image_backlog.append(future)
+            self.stats['images'] += 1
+        return future
+
+    def _store_image(self, url):
+        sleep(self.limiter.reserve(url))
+        return self.images.download(self.fetcher, url, self.get_file_name(url))
+
+    def _get_image_backlog(self):
+        """Returns the image downloads which are not done yet."""
+        self._image_backlog = [future for future in self._image_backlog if not future.done()]
+        return self._image_backlog
+
+    def _wait_for_images(self):
+        """Waits until less than max_pending_images downloads are pending."""
+        backlog = self._get_image_backlog()
+        if len(backlog) >= self.max_pending_images:
+            wait(backlog, return_when=FIRST_COMPLETED)
 
     def record_can_have_child_jobs(self, record):
         if '_follow' in record:
@@ -51,3 +367,168 @@ class Scraper(object):
         name = parts[-1]
         name = name.replace('?', '')
         return name[:130]
+
+
+class AsyncScraper(Scraper):
+    """Scraper which executes up to `concurrency` jobs at once on an asyncio event loop.
+
+    Fetches are waited for in a thread pool and parsing is done in a separate pool of
+    `parse_workers`, so the loop itself never blocks. The queue is only used from the loop and the
+    store only from a thread of its own, which writes the records in the order they were scraped.
+    This keeps their contract and the resulting records the same as with the Scraper.
+
+    Jobs waiting for the request_interval of their host don't take a fetch slot, up to
+    `max_pending` jobs are taken from the queue so other hosts keep being fetched meanwhile. The
+    queue is asked to renew the leases of these jobs until they are done.
+    Pages of a host with a pageload delay are fetched one after another, each waiting for the
+    pause after the previous one.
+
+    With `parse_processes` pages are extracted in that many processes instead of threads, which
+    only get the page content and send back the records with their follow links. The observer
+    doesn't see their selector calls.
+    """
+    concurrency = 10
+    parse_workers = 2
+    parse_processes = 0
+    max_pending = None
+
+    def __init__(self, queue, sitemap, store, concurrency=None, parse_workers=None,
+                 parse_processes=None, max_pending=None, **kwds):
+        super().__init__(queue, sitemap, store, **kwds)
+        self.concurrency = int(concurrency or self.concurrency)
+        self.parse_workers = int(parse_workers or self.parse_workers)
+        self.parse_processes = int(parse_processes or self.parse_processes)
+        self.max_pending = int(max_pending or self.max_pending or 10 * self.concurrency)
+        self._host_locks = {}
+        self._host_jobs = Counter()
+        self._store_pool = None
+        self._store_writes = []
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        fetch_pool = ThreadPoolExecutor(self.concurrency)
+        if self.parse_processes:
+            if self.observer is not None:
+                logger.warning('selector calls are not observed when parsing in processes')
+            parse_pool = ProcessPoolExecutor(self.parse_processes)
+        else:
+            parse_pool = ThreadPoolExecutor(self.parse_workers)
+        self._store_pool = ThreadPoolExecutor(1)
+        try:
+            loop.run_until_complete(self._crawl(loop, fetch_pool, parse_pool))
+        finally:
+            try:
+                loop.run_until_complete(self._flush_async(loop))
+            finally:
+                self.close()
+                self.report_metrics(force=True)
+                fetch_pool.shutdown()
+                parse_pool.shutdown()
+                self._store_pool.shutdown()
+                self._store_pool = None
+                loop.close()
+
+    async def _crawl(self, loop, fetch_pool, parse_pool):
+        self.init_first_jobs()
+        fetch_slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+        try:
+            while True:
+                while (len(running) < self.max_pending and
+                       len(self._get_image_backlog()) < self.max_pending_images):
+                    job = self.get_next_job()
+                    if not job:
+                        break
+                    running.add(loop.create_task(self._run_job_async(
+                        job, loop, fetch_pool, parse_pool, fetch_slots)))
+                if not running:
+                    await self._flush_async(loop)
+                    if self._is_crawl_done():
+                        break
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                # leases of long waiting jobs are renewed at least every poll_interval
+                done, running = await asyncio.wait(running, timeout=self.poll_interval,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                self.queue.renew(self._held_jobs)
+                # errors of all finished jobs are retrieved, the first one is raised
+                for error in [task.exception() for task in done]:
+                    if error is not None:
+                        raise error
+                self._save_written()
+        except BaseException:
+            for task in running:
+                task.cancel()
+            raise
+
+    async def _run_job_async(self, job, loop, fetch_pool, parse_pool, fetch_slots):
+        delay = self.get_pageload_delay(job)
+        if delay:
+            content = await self._fetch_paused_async(job, delay, loop, fetch_pool, fetch_slots)
+        else:
+            content = await self._fetch_async(job, loop, fetch_pool, fetch_slots)
+        if content is None:
+            self.stats['rejected_pages'] += 1
+        elif isinstance(parse_pool, ProcessPoolExecutor):
+            digest = self.get_page_digest(content)
+            records = self.get_known_records(job, digest)
+            parses = 0
+            if records is None:
+                with self.metrics.timer('parse_seconds'):
+                    records, parses = await loop.run_in_executor(
+                        parse_pool, parse_in_worker, self._get_sitemap_json(), job.parent_id,
+                        content)
+                self.remember_records(job, digest, records)
+            job.add_results(records, parses)
+        else:
+            await loop.run_in_executor(parse_pool, job.parse, content)
+        self._save_job_results(job)
+
+    async def _fetch_async(self, job, loop, fetch_pool, fetch_slots):
+        # the slot is reserved when the job is next for its host, waiting takes no fetch slot
+        await asyncio.sleep(self.limiter.reserve(job.url))
+        async with fetch_slots:
+            return await loop.run_in_executor(fetch_pool, self._fetch, job)
+
+    def _save_records(self, ready):
+        self._store_writes.append(self._store_pool.submit(self._write_records, ready))
+
+    def _save_written(self):
+        """Marks the jobs as done whose records the store thread has written."""
+        while self._store_writes and self._store_writes[0].done():
+            self._records_saved(*self._store_writes.pop(0).result())
+
+    async def _flush_async(self, loop):
+        """Like flush, but images and store writes are waited for without blocking the loop."""
+        downloads = [asyncio.wrap_future(future, loop=loop) for job, records, downloads
+                     in self._waiting_jobs for record, column, future in downloads]
+        if downloads:
+            await asyncio.wait(downloads)
+        self._save_downloaded()
+        self._store_writes.append(self._store_pool.submit(self._flush_records))
+        for future in list(self._store_writes):
+            await asyncio.wrap_future(future, loop=loop)
+        self._save_written()
+        self._finish_jobs()
+
+    def _flush_records(self):
+        if self._records is not None:
+            self._records.flush()
+        return [], True
+
+    async def _fetch_paused_async(self, job, delay, loop, fetch_pool, fetch_slots):
+        """Fetches the pages of a host with a pageload delay one after another like the Scraper."""
+        host = self.limiter.get_host(job.url)
+        lock = self._host_locks.get(host)
+        if lock is None:
+            lock = self._host_locks[host] = asyncio.Lock()
+        self._host_jobs[host] += 1
+        try:
+            async with lock:
+                content = await self._fetch_async(job, loop, fetch_pool, fetch_slots)
+                self.limiter.pause(job.url, delay)
+                return content
+        finally:
+            self._host_jobs[host] -= 1
+            if not self._host_jobs[host]:
+                del self._host_jobs[host], self._host_locks[host]
@@ -1,7 +1,6 @@
 import re
-from time import sleep
 
-from noscrapy.utils import Field, PyQuery, Type, etree
+from noscrapy.utils import Field, PyQuery, Type, parse_html, select
 
 
 class SelectorType(Type):
@@ -22,7 +21,7 @@ class Selector(metaclass=SelectorType):
     can_have_local_childs = Field(False, ro=True)
     can_create_new_jobs = Field(False, ro=True)
     will_return_items = Field(False, ro=True)
-    columns = Field(fget='_get_columns', ro=True)
+    columns = Field(fget='_columns', ro=True)
     will_return_many = Field(fget='_will_return_many', ro=True)
 
     id = Field()
@@ -30,7 +29,8 @@ class Selector(metaclass=SelectorType):
     parents = Field(default=lambda: ['_root'])
     many = Field(True)
     delay = Field(0)
-    regex = Field(None)
+    regex = Field(None, fset='_set_regex')
+    regex_groups = Field(False)
     item_css = Field('*')
 
     def __new__(cls, *args, **features):
@@ -102,9 +102,27 @@ class Selector(metaclass=SelectorType):
     def _will_return_many(self):
         return self.can_return_many and self.many
 
+    def _columns(self):
+        return self._get_columns() + self._get_regex_columns()
+
     def _get_columns(self):
         return self.id,
 
+    def _get_regex_columns(self):
+        return tuple('%s-%s' % (self.id, name) for name in self._get_regex_groups())
+
+    def _get_regex_groups(self):
+        pattern = self.__dict__.get('_pattern')
+        if not pattern or not self.regex_groups:
+            return ()
+        return tuple(sorted(pattern.groupindex, key=pattern.groupindex.get))
+
+    def _set_regex(self, regex):
+        # compile only once, the field getter sets the value again on every access
+        if '_pattern' not in self.__dict__ or regex != self.__dict__.get('regex'):
+            self.__dict__['_pattern'] = re.compile(regex) if regex else None
+        self.__dict__['regex'] = regex
+
     def has_parent(self, parent_id):
         return parent_id in self.parents
 
@@ -123,47 +141,63 @@ class Selector(metaclass=SelectorType):
 
     def get_items(self, parent_item):
         if not isinstance(parent_item, PyQuery):
-            try:
-                parent_item = PyQuery(parent_item)
-            except (etree.ParserError, etree.XMLSyntaxError) as e:  # pragma: no cover
-                if isinstance(parent_item, str) and (not parent_item.strip() or
-                                                     'Document is empty' == str(e)):
-                        parent_item = PyQuery(None)
-                else:
-                    raise
+            parent_item = parse_html(parent_item)
         if parent_item and isinstance(parent_item[0], str):
             return
-        query = parent_item(self.css)
+        query = select(parent_item, self.css)
         for item in query.items():
             yield item
             if not self.many:
                 break
 
-    def get_data(self, parent_item):
-        sleep(int(self.delay or 0))
-        yield from self._get_data(parent_item)
-
-    def _get_data(self, parent_item):
-        if self.inline_many:
-            results = []
-        yielded = False
-        for item in self.get_items(parent_item):
-            for data in self._get_item_data(item):
-                if self.regex:
-                    matches = re.search(self.regex, data[self.id])
-                    data[self.id] = matches.group() if matches else None
-                if self.inline_many:
-                    results.append(data)
-                else:
-                    yield data
-                    yielded = True
-            if yielded and not self.many:
+    def get_data(self, parent_item, observer=None):
+        """Yields the records of parent_item.
+
+        An observer can wrap the matched items with observe_items(selector, items) and the
+        extraction of every item with observe_item_data(selector, get_item_data), eg. to profile.
+        """
+        # delay is only a hint for the scraper to leave the host alone, it never waits here
+        yield from self._get_data(parent_item, observer)
+
+    def _get_data(self, parent_item, observer=None):
+        items = self.get_items(parent_item)
+        get_item_data = self._get_item_data
+        if observer is not None:
+            items = observer.observe_items(self, items)
+            get_item_data = observer.observe_item_data(self, get_item_data)
+        results = []
+        for item in items:
+            item_results = list(get_item_data(item))
+            results.extend(item_results)
+            if item_results and not self.many and not self.inline_many:
                 break
+        self.apply_regex(results)
         if self.inline_many:
             yield {self.id: tuple(results)}
-        elif not yielded:
+        elif results:
+            yield from results
+        else:
             yield from self._get_noitems_data()
 
+    def apply_regex(self, results):
+        """Replaces the values of this selector in a batch of results with the regex match.
+
+        With regex_groups each named group of the regex is set as extra column id-name.
+        """
+        pattern = self.__dict__.get('_pattern')
+        if not pattern:
+            return
+        search = pattern.search
+        columns = tuple(zip(self._get_regex_groups(), self._get_regex_columns()))
+        for data in results:
+            if self.id not in data:
+                continue
+            value = data[self.id]
+            matches = search(value) if isinstance(value, str) else None
+            data[self.id] = matches.group() if matches else None
+            for name, column in columns:
+                data[column] = matches.group(name) if matches else None
+
     def _get_item_data(self, item):
         raise NotImplementedError
 
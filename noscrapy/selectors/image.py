@@ -1,7 +1,5 @@
-import base64
-
 from ..selector import Selector
-from ..utils import Field, requests
+from ..utils import Field
 
 
 class ImageSelector(Selector):
@@ -10,18 +8,17 @@ class ImageSelector(Selector):
     download_image = Field(False)
 
     def _get_columns(self):
+        if self.download_image:
+            return self.id + '-src', self.id + '-file'
         return self.id + '-src',
 
     def _get_item_data(self, item):
         src = item.attr.src
         data = {self.id + '-src': src}
         if src and self.download_image:
-            data['_image_base64'] = self.download_image_base64(src)
+            # the scraper downloads it and sets the stored file as id-file
+            data['_image-' + self.id] = src
         yield data
 
     def _get_noitems_data(self):
         yield {self.id + '-src': None}
-
-    def download_image_base64(self, url):
-        response = requests.get(url)
-        return base64.encodebytes(response.content)
@@ -6,8 +6,11 @@ class ItemSelector(Selector):
     can_have_local_childs = True
     will_return_items = True
 
-    def _get_data(self, parent_item):
-        yield from self.get_items(parent_item)
+    def _get_data(self, parent_item, observer=None):
+        items = self.get_items(parent_item)
+        if observer is not None:
+            items = observer.observe_items(self, items)
+        yield from items
 
     def _get_columns(self):
         return ()
@@ -9,6 +9,12 @@ from .selector import Selector
 START_URLS_RE = re.compile(r'^(.*?)\[(\d+)\-(\d+)(:(\d+))?\](.*)$')
 
 class Sitemap(MutableSequence, metaclass=Type):
+    """List of selectors with the tree logic of a web-scraper sitemap.
+
+    The parent to child relations and the properties derived from them are indexed on first use.
+    The index gets rebuilt after adding, replacing, renaming or deleting selectors, changes made
+    directly on the contained selectors require a call to invalidate().
+    """
     id = Field(None)
     ids = Field(fget='_ids', ro=True)
     possible_parent_ids = Field(fget='_possible_parent_ids', ro=True)
@@ -21,6 +27,7 @@ class Sitemap(MutableSequence, metaclass=Type):
 
     def __init__(self, *args, **features):
         self.selectors = []
+        self._index = None
         for arg in args:
             if isinstance(arg, str):
                 features['id'] = arg
@@ -52,13 +59,22 @@ class Sitemap(MutableSequence, metaclass=Type):
             if not selector.parents and selector_id != selector.id:
                 unlinked_ids.append(selector.id)
         del self.selectors[index]
+        self.invalidate()
         for unlinked_id in unlinked_ids:
             del self[unlinked_id]
 
     def __getitem__(self, index):
-        index = index if isinstance(index, (int, slice)) else self.selectors.index(index)
+        index = index if isinstance(index, (int, slice)) else self._position(index)
         return self.selectors[index]
 
+    def _position(self, value):
+        if isinstance(value, str):
+            try:
+                return self._get_index()['positions'][value]
+            except KeyError:
+                raise ValueError('%r is not in sitemap' % value)
+        return self.selectors.index(value)
+
     def get(self, index, default=None):
         try:
             return self[index]
@@ -75,12 +91,32 @@ class Sitemap(MutableSequence, metaclass=Type):
         self.selectors[index] = selector
         if current.id != selector.id:
             self._rename_parents(current.id, selector.id)
+        self.invalidate()
 
     def insert(self, index, value):
         selector = Selector(value)
         if selector.id in self.selectors:
             raise ValueError('Id %r is already taken' % selector.id)
         self.selectors.insert(index, selector)
+        self.invalidate()
+
+    def invalidate(self):
+        """Drops the index of selector relations, it gets rebuilt on next use."""
+        self._index = None
+
+    def _get_index(self):
+        index = self._index
+        if index is None:
+            childs, positions = {}, {}
+            for pos, selector in enumerate(self.selectors):
+                positions.setdefault(selector.id, pos)
+                for parent_id in selector.parents:
+                    parent_childs = childs.setdefault(parent_id, [])
+                    if not parent_childs or parent_childs[-1] is not selector:
+                        parent_childs.append(selector)
+            index = self._index = {'childs': childs, 'positions': positions, 'descendants': {},
+                                   'will_return_many': {}, 'common': {}, 'trees': {}}
+        return index
 
     def __len__(self):
         return len(self.selectors)
@@ -125,22 +161,28 @@ class Sitemap(MutableSequence, metaclass=Type):
         if not parent_id:
             yield from self.selectors
             return
-
-        results = set()
-        def get_childs(parent_id):
-            for pos, selector in enumerate(self):
-                if pos not in results and selector.has_parent(parent_id):
-                    results.add(pos)
-                    get_childs(selector.id)
-        get_childs(parent_id)
-        for pos in sorted(results):
-            yield self[pos]
+        for pos in self._get_descendants(parent_id):
+            yield self.selectors[pos]
+
+    def _get_descendants(self, parent_id):
+        index = self._get_index()
+        descendants = index['descendants'].get(parent_id)
+        if descendants is None:
+            childs, positions = index['childs'], index['positions']
+            results = set()
+            pending = [parent_id]
+            while pending:
+                for selector in childs.get(pending.pop(), ()):
+                    pos = positions[selector.id]
+                    if pos not in results:
+                        results.add(pos)
+                        pending.append(selector.id)
+            descendants = index['descendants'][parent_id] = tuple(sorted(results))
+        return descendants
 
     def get_direct_childs(self, parent_id):
         """Returns only selectors that are directly under a parent."""
-        for selector in self:
-            if selector.has_parent(parent_id):
-                yield selector
+        yield from self._get_index()['childs'].get(parent_id, ())
 
     def get_one_page_selectors(self, selector_id):
         selector = self.get(selector_id)
@@ -175,13 +217,12 @@ class Sitemap(MutableSequence, metaclass=Type):
             yield self[pos]
 
     def will_return_many(self, selector_id):
-        selector = self.get(selector_id)
-        if selector.will_return_many:
-            return True
-        for child_selector in self.get_all(selector_id):
-            if child_selector.will_return_many:
-                return True
-        return False
+        memo = self._get_index()['will_return_many']
+        if selector_id not in memo:
+            selector = self.get(selector_id)
+            memo[selector_id] = selector.will_return_many or any(
+                child.will_return_many for child in self.get_all(selector_id))
+        return memo[selector_id]
 
     def get_one_page_css(self, selector_id, parent_ids):
         """Return css selector for a given element which includes all parent element selectors.
@@ -201,6 +242,12 @@ class Sitemap(MutableSequence, metaclass=Type):
         return ' '.join(s for s in css_deque if s)
 
     def _has_recursive_selectors(self):
+        index = self._get_index()
+        if 'recursive' not in index:
+            index['recursive'] = self._find_recursive_selectors()
+        return index['recursive']
+
+    def _find_recursive_selectors(self):
         recursion_found = [False]
         for top_selector in self:
             visited = []
@@ -219,6 +266,7 @@ class Sitemap(MutableSequence, metaclass=Type):
     def _rename_parents(self, current_id, new_id):
         for selector in self:
             selector.rename_parent(current_id, new_id)
+        self.invalidate()
 
     def _get_start_urls(self):
         for url in self._start_urls:
@@ -238,25 +286,42 @@ class Sitemap(MutableSequence, metaclass=Type):
     def get_csv_rows(self, row_dicts):
         headers = self.columns
         yield headers
+        # one encoder for all cells, json.dumps would create a new one per cell
+        encode = json.JSONEncoder().encode
         for row_dict in row_dicts:
-            csv_row = []
-            for header in headers:
-                cell = row_dict.get(header, '')
-                if not isinstance(cell, str):
-                    cell = json.dumps(cell)
-                csv_row.append(cell)
-            yield tuple(csv_row)
-
-    def get_data(self):
+            yield tuple(cell if isinstance(cell, str) else encode(cell)
+                        for cell in (row_dict.get(header, '') for header in headers))
+
+    def get_data(self, parent_item=None, observer=None):
+        """Yields the records found in parent_item, which defaults to the parent_item field.
+
+        An observer gets every selector call as observer.get_selector_data(selector, parent_item)
+        and returns its records, eg. to measure the time spent per selector.
+        """
+        if parent_item is None:
+            parent_item = self.parent_item
         for tree in self.trees:
-            for results in self.get_selector_tree_data(tree, self.parent_id, self.parent_item):
+            for results in self.get_selector_tree_data(tree, self.parent_id, parent_item,
+                                                       observer=observer):
                 yield results
 
+    @staticmethod
+    def get_selector_data(selector, parent_item, observer=None):
+        if observer is None:
+            return selector.get_data(parent_item)
+        return observer.get_selector_data(selector, parent_item)
+
     @property
     def trees(self):
-        """List of independent selector lists. follow=true splits selectors in trees.
-        Two side by side type=multiple selectors split trees."""
-        return self._find_trees(self.parent_id, [])
+        """Tuple of independent selector lists. follow=true splits selectors in trees.
+        Two side by side type=multiple selectors split trees.
+
+        The trees are only built once per parent_id and have to be treated as read only."""
+        memo = self._get_index()['trees']
+        trees = memo.get(self.parent_id)
+        if trees is None:
+            trees = memo[self.parent_id] = tuple(self._find_trees(self.parent_id, []))
+        return trees
 
     def _find_trees(self, parent_id, common_selectors_from_parent):
         common_selectors = common_selectors_from_parent[:]
@@ -281,14 +346,17 @@ class Sitemap(MutableSequence, metaclass=Type):
         # it there were not any selectors that make a separate tree then all common selectors make up a single selector tree
         return trees or [Sitemap(common_selectors)]
 
-    def get_selector_tree_data(self, tree, parent_id, parent_item, common_data=None):
-        child_common_data = self.get_selector_tree_common_data(tree, parent_id, parent_item)
+    def get_selector_tree_data(self, tree, parent_id, parent_item, common_data=None,
+                               observer=None):
+        child_common_data = self.get_selector_tree_common_data(tree, parent_id, parent_item,
+                                                               observer)
         common_data = dict(common_data or {}, **child_common_data)
         yielded = False
         for selector in tree.get_direct_childs(parent_id):
             if tree.will_return_many(selector.id):
                 new_common_data = dict(common_data)
-                for responses in self.get_many_selector_data(tree, selector, parent_item, new_common_data):
+                for responses in self.get_many_selector_data(tree, selector, parent_item,
+                                                             new_common_data, observer):
                     yield responses
                     yielded = True
         if not yielded and common_data:
@@ -308,6 +376,12 @@ class Sitemap(MutableSequence, metaclass=Type):
     def selector_is_common_to_all_trees(self, selector):
         """The selector cannot return multiple records and it also cannot create new jobs.
         Also all of its child selectors must have the same features."""
+        memo = self._get_index()['common']
+        if selector.id not in memo:
+            memo[selector.id] = self._is_common_to_all_trees(selector)
+        return memo[selector.id]
+
+    def _is_common_to_all_trees(self, selector):
         if selector.will_return_many:
             return False
         # Link selectors which will follow to a new page also cannot be common to all selectors
@@ -319,34 +393,35 @@ class Sitemap(MutableSequence, metaclass=Type):
                 return False
         return True
 
-    def get_selector_tree_common_data(self, tree, parent_id, parent_item):
+    def get_selector_tree_common_data(self, tree, parent_id, parent_item, observer=None):
         common_data = {}
         for child in tree.get_direct_childs(parent_id):
             if tree.will_return_many(child.id):
                 continue
-            for results in self.get_selector_common_data(tree, child, parent_item):
+            for results in self.get_selector_common_data(tree, child, parent_item, observer):
                 common_data.update(results)
         return common_data
 
-    def get_selector_common_data(self, tree, selector, parent_item):
-        for data in selector.get_data(parent_item):
+    def get_selector_common_data(self, tree, selector, parent_item, observer=None):
+        for data in self.get_selector_data(selector, parent_item, observer):
             if selector.will_return_items:
-                yield self.get_selector_tree_common_data(tree, selector.id, data[0])
+                yield self.get_selector_tree_common_data(tree, selector.id, data[0], observer)
             else:
                 yield data
 
-    def get_many_selector_data(self, tree, selector, parent_item, common_data):
+    def get_many_selector_data(self, tree, selector, parent_item, common_data, observer=None):
         """Returns all data records for a selector that can return multiple records."""
         # if the selector is not an Item selector then its fetched data is the result.
         if selector.will_return_items:
             # handle situation when this selector is an Item Selector
-            for item in selector.get_data(parent_item):
+            for item in self.get_selector_data(selector, parent_item, observer):
                 new_common_data = dict(common_data)
-                for responses in self.get_selector_tree_data(tree, selector.id, item, new_common_data):
+                for responses in self.get_selector_tree_data(tree, selector.id, item,
+                                                             new_common_data, observer):
                     yield responses
         else:
             new_common_data = dict(common_data)
-            for record in selector.get_data(parent_item):
+            for record in self.get_selector_data(selector, parent_item, observer):
                 record.update(new_common_data)
                 yield record
 
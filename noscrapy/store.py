@@ -1,12 +1,106 @@
 import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
 
 import couchdb
 
 from noscrapy.sitemap import Sitemap
+from noscrapy.utils import json
 
 DB_NAME_RE = re.compile(r'[^a-z0-9_\$\(\)\+\-/]', re.I)
 
-class Store(object):
+class DataStore(object):
+    """Interface of the stores keeping the records scraped by a Scraper."""
+    def get_sitemap_data(self, sitemap_id):
+        """Returns the ScrapeResult holding the records of a sitemap."""
+        raise NotImplementedError
+
+    def reset_sitemap_data_db(self, sitemap_id):
+        """Removes all records of a sitemap."""
+        raise NotImplementedError
+
+    @staticmethod
+    def sanitize_sitemap_data_db_name(sitemap_id):
+        return 'sitemap-data-' + DB_NAME_RE.sub('_', sitemap_id)
+
+
+class ScrapeResult(object):
+    """Records of a sitemap. Saved records are buffered and written in batches by _write.
+
+        batch_size: Number of buffered records which get written together.
+        flush_interval: Seconds after which buffered records get written on the next save.
+        on_flush: Callback getting the number of records and seconds of every written batch.
+
+    Call flush() or use it as context manager to write the remaining records.
+    """
+    batch_size = 500
+    flush_interval = 5
+
+    def __init__(self, batch_size=None, flush_interval=None, on_flush=None):
+        self.batch_size = int(batch_size or self.batch_size)
+        self.flush_interval = self.flush_interval if flush_interval is None else flush_interval
+        self.on_flush = on_flush
+        self.stats = Counter()
+        self._buffer = []
+        self._buffer_time = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    @property
+    def pending(self):
+        """Number of saved records which are not written yet."""
+        return len(self._buffer)
+
+    def save(self, record):
+        if record:
+            if '_id' not in record:
+                record = {k: v for k, v in record.items() if not k.startswith('_')}
+            if not self._buffer:
+                self._buffer_time = time.monotonic()
+            self._buffer.append(record)
+            if (len(self._buffer) >= self.batch_size or
+                    time.monotonic() - self._buffer_time >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        docs, self._buffer = self._buffer, []
+        start = time.monotonic()
+        try:
+            self._write(docs)
+        except Exception:
+            # keep the records for the next flush, their jobs are not done
+            self._buffer = docs + self._buffer
+            raise
+        seconds = time.monotonic() - start
+        self.stats['batches'] += 1
+        self.stats['records'] += len(docs)
+        self.stats['seconds'] += seconds
+        if self.on_flush:
+            self.on_flush(len(docs), seconds)
+
+    def _write(self, docs):
+        """Writes docs, if it raises the docs left in the list are buffered again."""
+        raise NotImplementedError
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def filter(self, **kwds):
+        """Returns an iterator of the records having all given values."""
+        self.flush()
+        return (r for r in self if all(r.get(k) == v for k, v in kwds.items()))
+
+
+class Store(DataStore):
+    """CouchDB store of the web-scraper extension, holds the sitemaps and a database per sitemap."""
     def __init__(self, server_url=None, db_name='scraper-sitemaps'):
         self.server_url = server_url
         self.server = couchdb.Server(server_url) if server_url else couchdb.Server()
@@ -31,10 +125,6 @@ class Store(object):
         except couchdb.http.ResourceNotFound:
             pass
 
-    @staticmethod
-    def sanitize_sitemap_data_db_name(sitemap_id):
-        return 'sitemap-data-' + DB_NAME_RE.sub('_', sitemap_id)
-
     def update_sitemap(self, sitemap):
         if not sitemap.id:
             raise ValueError('cannot save sitemap without an id')
@@ -57,28 +147,88 @@ class Store(object):
         return sitemap_id in self.db
 
 
-class StoreScrapeResult(object):
-    def __init__(self, db):
+class StoreScrapeResult(ScrapeResult):
+    """Records of a sitemap in a CouchDB database, batches are written with one bulk request.
+
+    Reading is done in pages of page_size documents, the next page gets fetched in the background
+    while the current one is consumed. filter uses a persistent view per combination of keys in
+    the design document design_id, CouchDB keeps it updated incrementally.
+    """
+    page_size = 1000
+    design_id = '_design/noscrapy'
+
+    def __init__(self, db, page_size=None, **kwds):
+        super().__init__(**kwds)
         self.db = db
+        self.page_size = int(page_size or self.page_size)
+        self._views = set()
 
-    def save(self, record):
-        if record:
-            if '_id' in record:
-                self.db.update([record])
-            else:
-                self.db.save({k: v for k, v in record.items() if (not k.startswith('_') or k == '_id')})
+    def _write(self, docs):
+        results = self.db.update(docs)
+        failed = [(doc, error) for doc, (success, doc_id, error) in zip(docs, results)
+                  if not success]
+        if failed:
+            # only the failed docs are kept for the next flush
+            docs[:] = [doc for doc, error in failed]
+            raise failed[0][1]
 
     def __iter__(self):
-        for doc_id in self.db:
-            yield dict(self.db[doc_id])
+        self.flush()
+        for rows in self._iter_pages('_all_docs', include_docs=True):
+            for row in rows:
+                if not row.id.startswith('_design/'):
+                    yield dict(row.doc)
+
+    def _iter_pages(self, name, **options):
+        """Yields the rows of a view in pages, using the first row after a page as next start."""
+        options['limit'] = self.page_size + 1
+        def get_rows(options):
+            return list(self.db.view(name, **options))
+        with ThreadPoolExecutor(1) as executor:
+            next_rows = executor.submit(get_rows, options)
+            while next_rows:
+                rows = next_rows.result()
+                next_rows = None
+                if len(rows) > self.page_size:
+                    start = rows.pop()
+                    options = dict(options, startkey=start.key, startkey_docid=start.id)
+                    next_rows = executor.submit(get_rows, options)
+                yield rows
 
     def filter(self, **kwds):
+        self.flush()
         if not kwds:
-            return list(self)
-        keys = ','.join('doc["%s"]' % k for k in kwds)
-        vals = list(kwds.values())
-        map_fun = 'function(doc) {emit([%s], doc);}' % keys
-        return list(self.db.query(map_fun)[vals])
+            return iter(self)
+        keys = sorted(kwds)
+        view = self.get_filter_view(keys)
+        values = [kwds[k] for k in keys]
+        return (dict(row.doc) for rows in self._iter_pages(view, startkey=values, endkey=values,
+                                                           include_docs=True) for row in rows)
+
+    def get_filter_view(self, keys):
+        """Returns the name of the view indexing the documents by the values of keys.
+
+        The view gets added to the design document if it doesn't exist yet.
+        """
+        name = 'filter_' + sha1(json.dumps(keys).encode('utf-8')).hexdigest()[:16]
+        if name not in self._views:
+            emits = ', '.join('doc[%s]' % json.dumps(k) for k in keys)
+            map_fun = 'function(doc) {emit([%s], null);}' % emits
+            while True:
+                design = self.db.get(self.design_id) or {'_id': self.design_id,
+                                                         'language': 'javascript'}
+                views = design.setdefault('views', {})
+                if views.get(name, {}).get('map') == map_fun:
+                    break
+                views[name] = {'map': map_fun}
+                try:
+                    self.db.save(design)
+                    break
+                except couchdb.http.ResourceConflict:
+                    # changed by another process in the meantime
+                    continue
+            self._views.add(name)
+        return '%s/%s' % (self.design_id[len('_design/'):], name)
 
 DIRECT_NAME_MAP = [
     ('startUrl', 'start_urls'),
@@ -0,0 +1,18 @@
+from ..store import Store
+from .parquet import ParquetStore
+from .sqlite import SqliteStore
+
+BACKENDS = {
+    'couch': Store,
+    'parquet': ParquetStore,
+    'sqlite': SqliteStore,
+}
+
+def get_data_store(backend='couch', location=None):
+    """Returns a DataStore of the named backend, location is the server url, file or directory."""
+    cls = BACKENDS[backend]
+    if location is None and cls is Store:
+        return cls()
+    if location is None:
+        raise ValueError('backend %s needs a location' % backend)
+    return cls(location)
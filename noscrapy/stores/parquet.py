@@ -0,0 +1,88 @@
+import os
+import shutil
+import time
+from uuid import uuid4
+
+from ..store import DataStore, ScrapeResult
+from ..utils import json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+class ParquetStore(DataStore):
+    """Keeps the records of every sitemap as columnar parquet files in a directory.
+
+    Each written batch becomes one part file of the sitemap directory. All columns are strings,
+    values which are no strings get stored json encoded, like in the csv export.
+    """
+    def __init__(self, path):
+        if pyarrow is None:  # pragma: no cover
+            raise ImportError('ParquetStore requires pyarrow')
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def get_sitemap_data(self, sitemap_id):
+        return ParquetScrapeResult(self.get_sitemap_data_path(sitemap_id))
+
+    def get_sitemap_data_path(self, sitemap_id):
+        return os.path.join(self.path, self.sanitize_sitemap_data_db_name(sitemap_id))
+
+    def reset_sitemap_data_db(self, sitemap_id):
+        shutil.rmtree(self.get_sitemap_data_path(sitemap_id), ignore_errors=True)
+
+
+class ParquetScrapeResult(ScrapeResult):
+    """Records of a sitemap in a ParquetStore, records are only appended.
+
+    Part files are named by the start time and a random id of the writer and numbered within it,
+    so several processes can write to the same directory and the parts keep their order.
+    """
+    batch_size = 10000
+
+    def __init__(self, path, **kwds):
+        super().__init__(**kwds)
+        self.path = path
+        self._prefix = None
+        self._parts = 0
+
+    def get_part_paths(self):
+        if not os.path.isdir(self.path):
+            return []
+        names = sorted(n for n in os.listdir(self.path) if n.endswith('.parquet'))
+        return [os.path.join(self.path, n) for n in names]
+
+    def _write(self, docs):
+        os.makedirs(self.path, exist_ok=True)
+        columns = {}
+        for doc in docs:
+            for key in doc:
+                columns.setdefault(key, [])
+        for key, values in columns.items():
+            for doc in docs:
+                value = doc.get(key)
+                values.append(value if value is None or isinstance(value, str) else
+                              json.dumps(value))
+        schema = pyarrow.schema([(key, pyarrow.string()) for key in columns])
+        table = pyarrow.Table.from_arrays([pyarrow.array(v, pyarrow.string())
+                                           for v in columns.values()], schema=schema)
+        if self._prefix is None:
+            self._prefix = 'part-%020d-%s' % (time.time() * 1000000, uuid4().hex)
+        path = os.path.join(self.path, '%s-%06d.parquet' % (self._prefix, self._parts))
+        self._parts += 1
+        # readers only see complete parts
+        pyarrow.parquet.write_table(table, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def __iter__(self):
+        self.flush()
+        for path in self.get_part_paths():
+            parquet_file = pyarrow.parquet.ParquetFile(path)
+            # one row group at a time, iter_batches needs a pyarrow without python 3.5 support
+            for index in range(parquet_file.num_row_groups):
+                columns = parquet_file.read_row_group(index).to_pydict()
+                for values in zip(*columns.values()):
+                    yield dict(zip(columns, values))
@@ -0,0 +1,63 @@
+import sqlite3
+
+from ..store import DataStore, ScrapeResult
+from ..utils import json
+
+
+class SqliteStore(DataStore):
+    """Keeps the records of all sitemaps as json documents in one sqlite file.
+
+    It is used by one thread at a time, but not always the one creating it: the AsyncScraper
+    writes its records from a thread of its own.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                        'sitemap_id TEXT, doc_id TEXT, doc TEXT, UNIQUE (sitemap_id, doc_id))')
+        self.db.commit()
+
+    def get_sitemap_data(self, sitemap_id):
+        return SqliteScrapeResult(self.db, sitemap_id)
+
+    def reset_sitemap_data_db(self, sitemap_id):
+        self.db.execute('DELETE FROM records WHERE sitemap_id = ?', (sitemap_id,))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+class SqliteScrapeResult(ScrapeResult):
+    """Records of a sitemap in a SqliteStore, a batch is inserted in one transaction.
+
+    Records with an _id replace the record saved before with the same _id.
+    """
+    def __init__(self, db, sitemap_id, **kwds):
+        super().__init__(**kwds)
+        self.db = db
+        self.sitemap_id = sitemap_id
+
+    def _write(self, docs):
+        rows = ((self.sitemap_id, doc.get('_id'), json.dumps(doc)) for doc in docs)
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO records (sitemap_id, doc_id, doc) '
+                                'VALUES (?, ?, ?)', rows)
+
+    def __iter__(self):
+        return self._query()
+
+    def filter(self, **kwds):
+        return self._query(**kwds)
+
+    def _query(self, **kwds):
+        self.flush()
+        query = 'SELECT doc FROM records WHERE sitemap_id = ?'
+        params = [self.sitemap_id]
+        for key, value in kwds.items():
+            query += ' AND json_extract(doc, ?) IS ?'
+            params += ['$."%s"' % key.replace('"', '\\"'), value]
+        for doc, in self.db.execute(query + ' ORDER BY id', params):
+            yield json.loads(doc)
@@ -0,0 +1,42 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+from noscrapy import Sitemap, TextSelector
+from noscrapy.export import export
+
+SITEMAP = Sitemap([TextSelector('a'), TextSelector('b')])
+ROWS = [{'a': 'a1', 'b': 'b1'}, {'a': 'a2', 'b': ['b', 2], 'c': 'c'}, {'a': None}]
+
+def test_export_csv(tmpdir):
+    path = str(tmpdir.join('out.csv'))
+    export(SITEMAP, iter(ROWS), path)
+    with open(path, newline='') as f:
+        assert list(csv.reader(f)) == [['a', 'b'], ['a1', 'b1'], ['a2', '["b", 2]'], ['null', '']]
+
+def test_export_jsonl_gzip(tmpdir):
+    path = str(tmpdir.join('out.jsonl.gz'))
+    export(SITEMAP, iter(ROWS), path, 'jsonl', 'gzip')
+    with gzip.open(path, 'rt') as f:
+        assert [json.loads(line) for line in f] == ROWS
+
+def test_export_jsonl_zstd(tmpdir):
+    zstandard = pytest.importorskip('zstandard')
+    path = str(tmpdir.join('out.jsonl.zst'))
+    export(SITEMAP, iter(ROWS), path, 'jsonl', 'zstd')
+    with open(path, 'rb') as f:
+        lines = zstandard.ZstdDecompressor().stream_reader(f).read().decode().splitlines()
+    assert [json.loads(line) for line in lines] == ROWS
+
+def test_export_parquet(tmpdir):
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmpdir.join('out.parquet'))
+    export(SITEMAP, iter(ROWS), path, 'parquet', 'zstd')
+    assert pyarrow_parquet.read_table(path).to_pydict() == {
+        'a': ['a1', 'a2', 'null'], 'b': ['b1', '["b", 2]', '']}
+
+def test_unknown_format(tmpdir):
+    with pytest.raises(ValueError):
+        export(SITEMAP, ROWS, str(tmpdir.join('out')), 'xml')
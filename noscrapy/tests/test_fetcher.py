@@ -0,0 +1,176 @@
+import io
+
+import pytest
+from mock import patch
+from requests import Response
+from requests.adapters import BaseAdapter
+
+from noscrapy import Fetcher
+from noscrapy.fetcher import RejectedResponse
+from noscrapy.httpcache import HttpCache
+from noscrapy.metrics import Metrics
+
+
+def test_one_session_per_host():
+    fetcher = Fetcher()
+    a = fetcher.get_session('http://a.lv/1')
+    assert fetcher.get_session('http://a.lv/2?x=1') is a
+    assert fetcher.get_session('https://a.lv/1') is not a
+    assert fetcher.get_session('http://b.lv/1') is not a
+
+def test_host_connection_limit():
+    fetcher = Fetcher(max_host_connections=3)
+    adapter = fetcher.get_session('http://a.lv/').get_adapter('http://a.lv/')
+    assert adapter._pool_maxsize == 3
+    assert adapter._pool_block
+
+def test_least_recently_used_host_gets_closed():
+    fetcher = Fetcher(max_hosts=2)
+    a = fetcher.get_session('http://a.lv/')
+    b = fetcher.get_session('http://b.lv/')
+    assert fetcher.get_session('http://a.lv/') is a
+    fetcher.get_session('http://c.lv/')
+    assert fetcher.get_session('http://a.lv/') is a
+    assert fetcher.get_session('http://b.lv/') is not b
+
+def test_close():
+    with Fetcher() as fetcher:
+        fetcher.get_session('http://a.lv/')
+    assert not fetcher._sessions
+
+class Body(io.BytesIO):
+    """Raw stream of a response counting the bytes read from it."""
+    read_bytes = 0
+
+    def read(self, *args):
+        data = super().read(*args)
+        self.read_bytes += len(data)
+        return data
+
+def make_response(status_code, content=b'', headers=None):
+    response = Response()
+    response.status_code = status_code
+    response.raw = Body(content)
+    response.headers.update(headers or {})
+    return response
+
+class FakeAdapter(BaseAdapter):
+    """Transport adapter answering with the given responses, their bodies are streamed."""
+    def __init__(self, *responses):
+        super().__init__()
+        self.responses = list(responses)
+        self.requests = []
+
+    def send(self, request, stream=False, **kwds):
+        response = self.responses.pop(0)
+        response.url = request.url
+        response.request = request
+        self.requests.append((request, stream))
+        return response
+
+    def close(self):
+        pass
+
+def mount(fetcher, *responses):
+    adapter = FakeAdapter(*responses)
+    fetcher.get_session('http://a.lv/').mount('http://', adapter)
+    return adapter
+
+def test_cache_revalidates(tmpdir):
+    cache = HttpCache(str(tmpdir.join('cache.sqlite')))
+    fetcher = Fetcher(cache=cache)
+    headers = {'ETag': '"1"', 'Last-Modified': 'Sat, 01 Oct 2016 10:00:00 GMT'}
+    adapter = mount(fetcher, make_response(200, b'page', headers), make_response(304),
+                    make_response(200, b'new'))
+    response = fetcher.get('http://a.lv/')
+    assert response.content == b'page'
+    assert not getattr(response, 'from_cache', False)
+    assert 'If-None-Match' not in adapter.requests[-1][0].headers
+
+    cache_get = patch.object(cache, 'get', wraps=cache.get)
+    with cache_get as get_mock:
+        response = fetcher.get('http://a.lv/')
+    # the cached body is only read for the 304
+    assert get_mock.call_count == 1
+    assert response.from_cache
+    assert (response.content, response.headers['ETag']) == (b'page', '"1"')
+    request_headers = adapter.requests[-1][0].headers
+    assert request_headers['If-None-Match'] == '"1"'
+    assert request_headers['If-Modified-Since'] == 'Sat, 01 Oct 2016 10:00:00 GMT'
+
+    with cache_get as get_mock:
+        assert fetcher.get('http://a.lv/').content == b'new'
+    assert not get_mock.called
+    assert cache.get('http://a.lv/').content == b'new'
+    assert cache.get_validators('http://b.lv/') == {}
+    cache.close()
+
+def test_cache_skips_errors(tmpdir):
+    with HttpCache(str(tmpdir.join('cache.sqlite'))) as cache:
+        fetcher = Fetcher(cache=cache)
+        mount(fetcher, make_response(500, b'error'))
+        assert fetcher.get('http://a.lv/').status_code == 500
+        assert cache.get('http://a.lv/') is None
+
+def test_streamed_body():
+    fetcher = Fetcher(max_body_size=10)
+    fetcher.chunk_size = 3
+    adapter = mount(fetcher, make_response(200, b'0123456789'))
+    response = fetcher.get('http://a.lv/')
+    assert response.content == b'0123456789'
+    assert adapter.requests[0][1]
+
+def test_too_large_body_gets_rejected():
+    fetcher = Fetcher(max_body_size=10)
+    fetcher.chunk_size = 3
+    response = make_response(200, b'0' * 100)
+    mount(fetcher, response, make_response(200, b'', {'Content-Length': '11'}))
+    with pytest.raises(RejectedResponse):
+        fetcher.get('http://a.lv/')
+    # the body is not read further than the limit
+    assert response.raw.read_bytes == 12
+    with pytest.raises(RejectedResponse):
+        fetcher.get('http://a.lv/')
+
+def test_page_content_types():
+    fetcher = Fetcher()
+    headers = {'Content-Type': 'application/pdf'}
+    response = make_response(200, b'%PDF', headers)
+    mount(fetcher, response, make_response(200, b'%PDF', headers),
+          make_response(200, b'<b>', {'Content-Type': 'text/html; charset=utf-8'}))
+    with pytest.raises(RejectedResponse):
+        fetcher.get_page('http://a.lv/')
+    assert response.raw.read_bytes == 0
+    assert fetcher.get('http://a.lv/').content == b'%PDF'
+    assert fetcher.get_page('http://a.lv/').content == b'<b>'
+
+def test_error_pages_get_rejected():
+    fetcher = Fetcher()
+    mount(fetcher, make_response(404, b'missing', {'Content-Type': 'text/html'}),
+          make_response(404, b'missing', {'Content-Type': 'text/html'}))
+    with pytest.raises(RejectedResponse):
+        fetcher.get_page('http://a.lv/')
+    assert fetcher.get('http://a.lv/').status_code == 404
+
+def test_fetcher_metrics():
+    metrics = Metrics()
+    fetcher = Fetcher(metrics=metrics, max_body_size=10)
+    mount(fetcher, make_response(404, b'missing'), make_response(200, b'0' * 20))
+    fetcher.get('http://a.lv/')
+    with pytest.raises(RejectedResponse):
+        fetcher.get('http://a.lv/')
+    assert metrics.snapshot()['counters'] == {
+        'requests,domain=a.lv': 2, 'bytes_in': 17, 'errors,domain=a.lv,error=404': 1,
+        'errors,domain=a.lv,error=RejectedResponse': 1}
+    assert metrics.histograms[('fetch_headers_seconds', ())].count == 2
+    assert metrics.histograms[('fetch_body_seconds', ())].count == 2
+
+def test_offline_cache(tmpdir):
+    with HttpCache(str(tmpdir.join('cache.sqlite'))) as cache:
+        cache.set('http://a.lv/', make_response(200, b'page'))
+        fetcher = Fetcher(cache=cache, offline=True)
+        with patch.object(fetcher, 'get_session') as get_session:
+            assert fetcher.get('http://a.lv/').content == b'page'
+            with pytest.raises(RejectedResponse):
+                fetcher.get('http://b.lv/')
+        assert not get_session.called
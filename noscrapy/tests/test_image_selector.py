@@ -1,5 +1,4 @@
 import pytest
-from mock import call, patch
 
 from noscrapy.selectors import ImageSelector
 
@@ -20,19 +19,9 @@ def test_image_selector_get_data(selector, html, expected):
 def test_image_selector_columns():
     assert ImageSelector('id').columns == ('id-src',)
 
-@patch('requests.get')
-def test_image_selector_with_download(get_mock):
-    class RequestMock:
-        content = b'abc'
-    get_mock.return_value = RequestMock()
-
+def test_image_selector_with_download():
     selector = ImageSelector('id', css='img', download_image=True)
-    actual = selector.download_image_base64('http://someimage')
-
-    assert get_mock.call_args_list == [call('http://someimage')]
-    assert actual == b'YWJj\n'
-
-    get_mock.reset_mock()
-    actual = list(selector.get_data('<img src="http://someimage">'))
-    assert get_mock.call_args_list == [call('http://someimage')]
-    assert actual == [{'id-src': 'http://someimage', '_image_base64': b'YWJj\n'}]
+    assert selector.columns == ('id-src', 'id-file')
+    actual = list(selector.get_data('<img src="http://someimage"><img>'))
+    assert actual == [{'id-src': 'http://someimage', '_image-id': 'http://someimage'},
+                      {'id-src': None}]
@@ -0,0 +1,48 @@
+import io
+import os
+
+import pytest
+from mock import patch
+from requests import Response
+
+from noscrapy import Fetcher
+from noscrapy.images import ImageFileStore
+
+
+def fake_get(contents):
+    def get(url, **kwds):
+        response = Response()
+        response.status_code = 200 if url in contents else 404
+        response.url = url
+        response.raw = io.BytesIO(contents.get(url, b'not found'))
+        return response
+    return get
+
+def test_download_dedups_content(tmpdir):
+    store = ImageFileStore(str(tmpdir))
+    fetcher = Fetcher()
+    contents = {'http://a.lv/a.png': b'png', 'http://b.lv/a.png': b'png',
+                'http://b.lv/b.png': b'png', 'http://b.lv/c.png': b'other'}
+    with patch.object(fetcher, 'get_session') as get_session:
+        get_session.return_value.get.side_effect = fake_get(contents)
+        a = store.download(fetcher, 'http://a.lv/a.png', 'a.png')
+        a_again = store.download(fetcher, 'http://b.lv/a.png', 'a.png')
+        b = store.download(fetcher, 'http://b.lv/b.png', 'b.png')
+        c = store.download(fetcher, 'http://b.lv/c.png', 'c.png')
+    assert a == a_again
+    assert os.path.dirname(a) == os.path.dirname(b) != os.path.dirname(c)
+    assert os.path.basename(b) == 'b.png'
+    assert os.stat(store.get_path(a)).st_ino == os.stat(store.get_path(b)).st_ino
+    with open(store.get_path(c), 'rb') as f:
+        assert f.read() == b'other'
+    assert os.listdir(store.tmp_path) == []
+
+def test_failed_download_stores_nothing(tmpdir):
+    store = ImageFileStore(str(tmpdir))
+    fetcher = Fetcher()
+    with patch.object(fetcher, 'get_session') as get_session:
+        get_session.return_value.get.side_effect = fake_get({})
+        with pytest.raises(IOError):
+            store.download(fetcher, 'http://a.lv/a.png', 'a.png')
+    assert os.listdir(str(tmpdir)) == ['tmp']
+    assert os.listdir(store.tmp_path) == []
@@ -1,7 +1,7 @@
 import pytest
-from mock import patch
+from mock import Mock
 
-from noscrapy import Job, Sitemap
+from noscrapy import Job, LinkSelector, Scraper, Sitemap, TextSelector
 
 URL_JOINS = {
     '0': ('http://example.com/', '/test/', 'http://example.com/test/'),
@@ -23,23 +23,26 @@ def test_urljoins(parent_url, fragment, url):
     assert url == child.url
 
 
-@patch('requests.get')
-def test_get_results(get_mock):
+def test_get_results():
     # should not override data with base data if it already exists
-    get_mock.content.return_value = ''
-    class ScraperMock:
-        def __init__(self):
-            self.sitemap = Sitemap()
-
+    scraper = Scraper(None, Sitemap(), None, fetcher=Mock())
     job = Job(url=None,
-              scraper=ScraperMock(),
+              scraper=scraper,
               base_data={'a': 'do not override', 'c': 3})
     try:
         original_get_data = Sitemap.get_data
-        Sitemap.get_data = lambda self: iter([{'a': 1, 'b': 2}])
+        Sitemap.get_data = lambda self, parent_item=None, observer=None: iter([{'a': 1, 'b': 2}])
         job.execute()
     finally:
         Sitemap.get_data = original_get_data
 
     results = job.get_results()
     assert [{'a': 'do not override', 'b': 2, 'c': 3}] == results
+
+def test_parse_document_once():
+    selectors = [TextSelector('a', many=0, css='a'), TextSelector('b', many=0, css='b'),
+                 LinkSelector('c', many=1, css='a'), TextSelector('d', many=0, css='b')]
+    job = Job(url=None, parent_id='_root', scraper=Scraper(None, Sitemap(selectors), None))
+    job.parse(b'<a href="x">a</a><b>b</b>')
+    assert job.parse_count == 1
+    assert job.get_results()[0]['b'] == 'b'
@@ -0,0 +1,70 @@
+import json
+import logging
+from urllib.request import urlopen
+
+from noscrapy.metrics import Histogram, JsonFileSink, LogSink, Metrics, PrometheusSink
+
+
+def test_histogram():
+    histogram = Histogram((0.1, 1))
+    assert histogram.quantile(0.5) is None
+    for value in (0.05, 0.05, 0.5, 5):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1
+    assert histogram.quantile(0.99) == float('inf')
+    assert histogram.get_state() == {'count': 4, 'sum': 5.6, 'p50': 0.1, 'p99': float('inf')}
+
+def test_metrics_snapshot():
+    metrics = Metrics()
+    metrics.incr('errors', domain='a.lv', error='500')
+    metrics.incr('errors', domain='a.lv', error='500')
+    metrics.set('pages', 3)
+    with metrics.timer('parse_seconds'):
+        pass
+    state = metrics.snapshot()
+    assert state['counters'] == {'errors,domain=a.lv,error=500': 2}
+    assert state['gauges'] == {'pages': 3}
+    assert state['histograms']['parse_seconds']['count'] == 1
+    assert state['pages_per_second'] > 0
+
+def test_metrics_observe_selectors():
+    class Selector(object):
+        id = 'a'
+
+        def get_data(self, parent_item):
+            yield {'a': parent_item}
+    metrics = Metrics()
+    assert metrics.get_selector_data(Selector(), 'x') == [{'a': 'x'}]
+    assert metrics.histograms[('selector_seconds', (('selector', 'a'),))].count == 1
+
+def test_render_prometheus():
+    metrics = Metrics()
+    metrics.incr('requests', domain='a.lv')
+    metrics.set('queue_depth', 2)
+    metrics.observe('parse_seconds', 0.002)
+    lines = metrics.render_prometheus().splitlines()
+    assert 'noscrapy_requests_total{domain="a.lv"} 1' in lines
+    assert 'noscrapy_queue_depth 2' in lines
+    assert 'noscrapy_parse_seconds_bucket{le="0.001"} 0' in lines
+    assert 'noscrapy_parse_seconds_bucket{le="0.0025"} 1' in lines
+    assert 'noscrapy_parse_seconds_bucket{le="+Inf"} 1' in lines
+    assert 'noscrapy_parse_seconds_count 1' in lines
+
+def test_sinks(tmpdir, caplog):
+    path = str(tmpdir.join('metrics.json'))
+    prometheus = PrometheusSink(0)
+    metrics = Metrics([LogSink(), JsonFileSink(path), prometheus], interval=0)
+    try:
+        metrics.set('pages', 1)
+        assert metrics.is_due()
+        with caplog.at_level(logging.INFO, logger='noscrapy'):
+            metrics.report()
+        assert 'pages=1' in caplog.text
+        with open(path) as f:
+            assert json.load(f)['gauges'] == {'pages': 1}
+        url = 'http://%s:%d/metrics' % prometheus.address
+        assert b'noscrapy_pages 1' in urlopen(url).read()
+    finally:
+        metrics.close()
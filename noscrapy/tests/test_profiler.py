@@ -0,0 +1,34 @@
+from noscrapy import ItemSelector, LinkSelector, Sitemap, TextSelector
+from noscrapy.profiler import Profiler
+
+HTML = '<div><b>1</b><i>a</i></div><div><b>2</b><i>b</i></div><a href="/next/">next</a>'
+
+def get_sitemap():
+    return Sitemap('test', [ItemSelector('div', css='div'),
+                            TextSelector('b', css='b', many=0, parents=['div']),
+                            TextSelector('i', css='i', many=0, parents=['div']),
+                            LinkSelector('next', css='a'),
+                            TextSelector('title', css='h1', parents=['next'])])
+
+def test_profile_selectors():
+    sitemap = get_sitemap()
+    profiler = Profiler()
+    records = list(sitemap.get_data(HTML, profiler))
+    assert records == list(sitemap.get_data(HTML))
+    report = {row['selector']: row for row in profiler.get_report()}
+    assert sorted(report) == ['b', 'div', 'i', 'next']
+    assert (report['div']['calls'], report['div']['nodes'], report['div']['records']) == (1, 2, 2)
+    assert (report['b']['calls'], report['b']['nodes'], report['b']['records']) == (2, 2, 2)
+    assert report['next']['nodes'] == 1
+    for row in report.values():
+        assert row['seconds'] >= row['items_seconds'] + row['data_seconds'] > 0
+    assert profiler.get_report()[0]['seconds'] == max(r['seconds'] for r in report.values())
+
+def test_profile_trees():
+    profiler = Profiler()
+    assert profiler.profile_trees(get_sitemap()) > 0
+    assert profiler.trees_seconds > 0
+    report = profiler.format_report()
+    assert report.splitlines()[0].split() == ['selector', 'calls', 'nodes', 'records', 'seconds',
+                                              'items_seconds', 'data_seconds']
+    assert report.splitlines()[-1].startswith('_find_trees ')
@@ -1,4 +1,7 @@
-from noscrapy import Job, Queue
+import time
+
+from noscrapy import Job, Queue, SqliteQueue
+from noscrapy.utils import BloomFilter
 
 
 def test_add_jobs():
@@ -24,3 +27,105 @@ def test_reject_documents():
     job = Job('http://test.lv/test.doc')
     assert not q.add(job)
     assert 0 == q.get_queue_size()
+
+def test_get_next_job_in_fifo_order():
+    q = Queue()
+    for i in range(3):
+        q.add(Job('http://test.lv/%d' % i))
+    assert [q.get_next_job().url for i in range(3)] == ['http://test.lv/%d' % i for i in range(3)]
+    assert q.get_next_job() is False
+
+def test_seen_urls_container():
+    q = Queue(seen=BloomFilter(100, 0.01))
+    assert q.add(Job('http://test.lv/'))
+    assert q.is_scraped('http://test.lv/')
+    assert not q.is_scraped('http://test.lv/1')
+    assert not q.add(Job('http://test.lv/'))
+
+def test_sqlite_queue(tmpdir):
+    q = SqliteQueue(str(tmpdir.join('frontier.sqlite')))
+    assert q.add(Job('http://test.lv/', '_root', base_data={'a': 1}))
+    assert not q.add(Job('http://test.lv/'))
+    assert not q.add(Job('http://test.lv/test.doc'))
+    assert 1 == q.get_queue_size()
+    job = q.get_next_job()
+    assert (job.url, job.parent_id, job.base_data) == ('http://test.lv/', '_root', {'a': 1})
+    assert 0 == q.get_queue_size()
+    assert q.get_next_job() is False
+    q.task_done(job)
+    q.close()
+
+def test_sqlite_queue_resume(tmpdir):
+    path = str(tmpdir.join('frontier.sqlite'))
+    q = SqliteQueue(path)
+    for i in range(3):
+        q.add(Job('http://test.lv/%d' % i, '_root'))
+    q.task_done(q.get_next_job())
+    # second job dies while running
+    q.get_next_job()
+    q.close()
+
+    q = SqliteQueue(path)
+    assert q.is_scraped('http://test.lv/0')
+    assert not q.add(Job('http://test.lv/0'))
+    assert 2 == q.get_queue_size()
+    assert [q.get_next_job().url for i in range(2)] == ['http://test.lv/1', 'http://test.lv/2']
+    q.close()
+
+def test_sqlite_queue_leases(tmpdir):
+    path = str(tmpdir.join('frontier.sqlite'))
+    a = SqliteQueue(path, 'a', lease_timeout=0.05)
+    b = SqliteQueue(path, 'b', lease_timeout=0.05)
+    for i in range(2):
+        a.add(Job('http://test.lv/%d' % i, '_root'))
+    assert not b.add(Job('http://test.lv/0'))
+    assert a.get_next_job().url == 'http://test.lv/0'
+    job = b.get_next_job()
+    assert job.url == 'http://test.lv/1'
+    assert a.get_next_job() is False
+    b.task_done(job)
+    assert not a.is_finished()
+    # a crashed, its lease expires
+    time.sleep(0.06)
+    assert b.get_queue_size() == 1
+    job = b.get_next_job()
+    assert job.url == 'http://test.lv/0'
+    b.task_done(job)
+    assert a.is_finished() and b.is_finished()
+    a.close()
+    b.close()
+
+def test_sqlite_queue_renews_leases(tmpdir):
+    path = str(tmpdir.join('frontier.sqlite'))
+    a = SqliteQueue(path, 'a', lease_timeout=0.2)
+    b = SqliteQueue(path, 'b', lease_timeout=0.2)
+    a.add(Job('http://test.lv/', '_root'))
+    job = a.get_next_job()
+    for i in range(4):
+        time.sleep(0.1)
+        a.renew([job])
+    assert b.get_next_job() is False
+    a.task_done(job)
+    assert b.is_finished()
+    a.close()
+    b.close()
+
+def test_sqlite_queue_workers_add_url_once(tmpdir):
+    path = str(tmpdir.join('frontier.sqlite'))
+    a = SqliteQueue(path, 'a')
+    b = SqliteQueue(path, 'b')
+    # b checked the url before a added it
+    b.is_scraped = lambda url: False
+    assert a.add(Job('http://test.lv/', '_root'))
+    assert not b.add(Job('http://test.lv/', '_root'))
+    assert a.get_queue_size() == 1
+    a.close()
+    b.close()
+
+def test_sqlite_queue_keeps_leases_of_other_workers_on_open(tmpdir):
+    path = str(tmpdir.join('frontier.sqlite'))
+    a = SqliteQueue(path, 'a')
+    a.add(Job('http://test.lv/', '_root'))
+    a.get_next_job()
+    assert SqliteQueue(path, 'b').get_next_job() is False
+    assert SqliteQueue(path).get_next_job().url == 'http://test.lv/'
@@ -0,0 +1,42 @@
+from noscrapy.ratelimit import RateLimiter
+
+
+class Clock(object):
+    now = 100.0
+
+    def __call__(self):
+        return self.now
+
+def test_reserve_spaces_requests_per_host():
+    limiter = RateLimiter(2, clock=Clock())
+    assert limiter.reserve('http://a.lv/1') == 0
+    assert limiter.reserve('http://A.lv/2') == 2
+    assert limiter.reserve('http://a.lv/3') == 4
+    assert limiter.reserve('http://b.lv/1') == 0
+
+def test_reserve_after_interval():
+    clock = Clock()
+    limiter = RateLimiter(2, clock=clock)
+    limiter.reserve('http://a.lv/')
+    clock.now += 3
+    assert limiter.reserve('http://a.lv/') == 0
+
+def test_pause():
+    clock = Clock()
+    limiter = RateLimiter(1, clock=clock)
+    limiter.pause('http://a.lv/', 0)
+    assert limiter.reserve('http://a.lv/') == 0
+    limiter.pause('http://a.lv/', 5)
+    assert limiter.reserve('http://a.lv/') == 5
+    # a pause never brings a later slot forward
+    limiter.pause('http://a.lv/', 1)
+    assert limiter.reserve('http://a.lv/') == 6
+
+def test_forgets_idle_hosts():
+    clock = Clock()
+    limiter = RateLimiter(1, max_hosts=2, clock=clock)
+    limiter.reserve('http://a.lv/')
+    limiter.reserve('http://b.lv/')
+    clock.now += 1
+    limiter.reserve('http://c.lv/')
+    assert sorted(limiter._slots) == ['c.lv']
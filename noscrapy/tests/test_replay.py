@@ -0,0 +1,97 @@
+import gzip
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import pytest
+
+from noscrapy.fetcher import RejectedResponse
+from noscrapy.replay import (DirectoryCorpus, Recorded, ReplayFetcher, ReplayServer, WarcCorpus,
+                             open_corpus)
+
+HTML = {'Content-Type': 'text/html'}
+
+WARC = (b'WARC/1.0\r\nWARC-Type: warcinfo\r\nContent-Length: 4\r\n\r\ninfo\r\n\r\n'
+        b'WARC/1.0\r\nWARC-Type: response\r\nWARC-Target-URI: <http://a.lv/>\r\n'
+        b'Content-Length: %d\r\n\r\n%s\r\n\r\n')
+RESPONSE = (b'HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nTransfer-Encoding: chunked\r\n\r\n'
+            b'3\r\n<a>\r\n4\r\n</a>\r\n0\r\n\r\n')
+
+def test_directory_corpus(tmpdir):
+    tmpdir.mkdir('a.lv').join('index.html').write('<a>')
+    tmpdir.join('a.lv').mkdir('img').join('1.png').write('png')
+    tmpdir.join('a.lv').join('list?page=2').write('<b>')
+    corpus = open_corpus(str(tmpdir))
+    assert isinstance(corpus, DirectoryCorpus)
+    assert corpus.get('http://a.lv/') == Recorded(200, HTML, b'<a>')
+    assert corpus.get('https://a.lv/img/1.png') == Recorded(200, {'Content-Type': 'image/png'},
+                                                            b'png')
+    assert corpus.get('http://a.lv/list?page=2').body == b'<b>'
+    assert corpus.get('http://a.lv/list') is None
+    assert corpus.get('http://a.lv/../../etc/passwd') is None
+
+@pytest.mark.parametrize('name', ['crawl.warc', 'crawl.warc.gz'])
+def test_warc_corpus(tmpdir, name):
+    path = str(tmpdir.join(name))
+    opener = gzip.open if name.endswith('.gz') else open
+    with opener(path, 'wb') as f:
+        f.write(WARC % (len(RESPONSE), RESPONSE))
+    corpus = open_corpus(path)
+    assert isinstance(corpus, WarcCorpus)
+    assert corpus.responses == {'http://a.lv/': Recorded(200, HTML, b'<a></a>')}
+
+def test_replay_pages():
+    corpus = {'http://a.lv/': Recorded(200, HTML, b'<a>'),
+              'https://b.lv/x?y=1': Recorded(200, HTML, b'<b>')}
+    with ReplayServer(corpus) as server, ReplayFetcher(server.address) as fetcher:
+        response = fetcher.get_page('http://a.lv/')
+        assert response.url == 'http://a.lv/'
+        assert response.content == b'<a>'
+        assert fetcher.get_page('https://b.lv/x?y=1').content == b'<b>'
+        assert fetcher.get('http://a.lv/missing').status_code == 404
+        # pages are not extracted from the text/plain errors
+        with pytest.raises(RejectedResponse):
+            fetcher.get_page('http://a.lv/missing')
+    assert server.stats == {'requests': 4, 'missing': 2, 'bytes_out': 30}
+
+def test_replay_errors():
+    corpus = {'http://a.lv/': Recorded(200, HTML, b'<a>')}
+    with ReplayServer(corpus, error_rate=0.5, seed=1) as server:
+        with ReplayFetcher(server.address) as fetcher:
+            statuses = [fetcher.get('http://a.lv/').status_code for i in range(100)]
+    assert set(statuses) == {200, 503}
+    assert 30 < statuses.count(503) == server.stats['errors'] < 70
+
+def test_replay_latency_and_bandwidth():
+    corpus = {'http://a.lv/': Recorded(200, HTML, b'x' * 1000)}
+    with ReplayServer(corpus, latency=0.05, bandwidth=10000) as server:
+        server.chunk_size = 250
+        with ReplayFetcher(server.address) as fetcher:
+            start = time.monotonic()
+            assert len(fetcher.get('http://a.lv/').content) == 1000
+            assert time.monotonic() - start >= 0.15
+
+def test_replay_host_concurrency():
+    corpus = {'http://a.lv/': Recorded(200, HTML, b'<a>'),
+              'http://b.lv/': Recorded(200, HTML, b'<b>')}
+    server = ReplayServer(corpus, latency=0.02, host_concurrency=2)
+    running = {'a.lv': 0, 'b.lv': 0}
+    most = dict(running)
+    lock = Lock()
+    respond = server._respond
+    def count_running(handler, url):
+        host = url.split('/')[2]
+        with lock:
+            running[host] += 1
+            most[host] = max(most[host], running[host])
+        try:
+            respond(handler, url)
+        finally:
+            with lock:
+                running[host] -= 1
+    server._respond = count_running
+    with server, ReplayFetcher(server.address) as fetcher:
+        with ThreadPoolExecutor(8) as executor:
+            urls = ['http://a.lv/', 'http://b.lv/'] * 8
+            assert all(r.status_code == 200 for r in executor.map(fetcher.get, urls))
+    assert most == {'a.lv': 2, 'b.lv': 2}
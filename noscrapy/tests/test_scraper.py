@@ -1,6 +1,17 @@
+import threading
+import time
+
 import pytest
+from mock import Mock, call, patch
 
-from noscrapy import LinkSelector, Queue, Scraper, Sitemap, TextSelector
+from noscrapy import (AsyncScraper, Fetcher, ImageSelector, LinkSelector, Queue, Scraper, Sitemap,
+                      SqliteQueue, TextSelector)
+from noscrapy.fetcher import RejectedResponse
+from noscrapy.images import ImageFileStore
+from noscrapy.metrics import Metrics
+from noscrapy.pagestore import PageStore
+from noscrapy.profiler import Profiler
+from noscrapy.replay import Recorded, ReplayFetcher, ReplayServer
 
 
 class FakeStore(object):
@@ -15,30 +26,118 @@ class FakeStore(object):
                 return iter(self.store.data)
             def save(self, obj):
                 self.store.data.append(obj)
+            def flush(self):
+                pass
+            pending = 0
 
         return FakeStoreScrapeResult(self)
 
-# fake store does something different but live works, case for rewrite anyway
-@pytest.mark.xfail
-def test_scrape_one_page():
+@pytest.fixture(autouse=True)
+def no_request_interval(monkeypatch):
+    # all fake pages are on one host
+    monkeypatch.setattr(Scraper, 'request_interval', 0)
+
+@pytest.fixture
+def replay():
+    """Returns a function serving pages by url with a local ReplayServer and its fetcher."""
+    servers, fetchers = [], []
+    def replay(pages, **options):
+        corpus = {url: Recorded(200, {'Content-Type': 'text/html'}, content.encode('utf-8'))
+                  for url, content in pages.items()}
+        server = ReplayServer(corpus, **options)
+        server.start()
+        servers.append(server)
+        fetchers.append(ReplayFetcher(server.address))
+        return fetchers[-1]
+    yield replay
+    for fetcher in fetchers:
+        fetcher.close()
+    for server in servers:
+        server.close()
+
+class FakeResponse(object):
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+
+@pytest.fixture
+def fake_get():
+    """Returns a function answering Fetcher.get with pages without a server, for timings.
+
+    Every request waits delay seconds and calls before with its url first. The function returns
+    the mock of Fetcher.get and stats with the most requests running at once.
+    """
+    patchers = []
+    def fake_get(pages, delay=0, before=None):
+        stats = {'running': 0, 'max_running': 0}
+        lock = threading.Lock()
+        def get(url, **kwds):
+            if before is not None:
+                before(url)
+            with lock:
+                stats['running'] += 1
+                stats['max_running'] = max(stats['max_running'], stats['running'])
+            time.sleep(delay)
+            with lock:
+                stats['running'] -= 1
+            return FakeResponse(pages[url])
+        patchers.append(patch.object(Fetcher, 'get', side_effect=get))
+        return patchers[-1].start(), stats
+    yield fake_get
+    for patcher in patchers:
+        patcher.stop()
+
+def numbered_pages(urls):
+    """Returns pages with their number in a <b> and the sitemap extracting it from all of them.
+
+    urls are the start urls or their count on test.lv.
+    """
+    if isinstance(urls, int):
+        urls = ['http://test.lv/%d/' % i for i in range(urls)]
+    pages = {url: '<b>%d</b>' % i for i, url in enumerate(urls)}
+    return pages, Sitemap('test', [TextSelector('b', many=0, css='b')], start_urls=urls)
+
+def test_scrape_one_page(replay):
     selectors = [TextSelector('a', many=0, css='a')]
-    sitemap = Sitemap('test', selectors, start_urls='http://test.lv/', parent_item='<a>a</a>')
+    sitemap = Sitemap('test', selectors, start_urls='http://test.lv/')
     store, queue = FakeStore(), Queue(),
-    scraper = Scraper(queue, sitemap, store)
+    scraper = Scraper(queue, sitemap, store, fetcher=replay({'http://test.lv/': '<a>a</a>'}))
     scraper.run()
     assert store.data == [{'a': 'a'}]
 
-@pytest.mark.xfail
-def test_scrape_child_page():
+def test_scrape_child_page(replay):
     selectors = [LinkSelector('link', many=1, css='a'),
                  TextSelector('b', many=0, css='b', parents=['_root', 'link'])]
-    sitemap = Sitemap('test', selectors, start_urls='http://test.lv/',
-                      parent_item='<a href="http://test.lv/1/">test</a><b>b</b>')
+    sitemap = Sitemap('test', selectors, start_urls='http://test.lv/')
+    content = '<a href="http://test.lv/1/">test</a><b>b</b>'
+    fetcher = replay({'http://test.lv/': content, 'http://test.lv/1/': content})
     store, queue = FakeStore(), Queue(),
-    scraper = Scraper(queue, sitemap, store)
+    scraper = Scraper(queue, sitemap, store, fetcher=fetcher)
     scraper.run()
     assert store.data == [{'link': 'test', 'link-href': 'http://test.lv/1/', 'b': 'b'}]
 
+@pytest.mark.parametrize('scraper_class', [Scraper, AsyncScraper])
+def test_replayed_errors_are_rejected(replay, scraper_class):
+    sitemap = Sitemap('test', [TextSelector('a', many=0, css='a')],
+                      start_urls='http://test.lv/[0-1]/')
+    # the error pages are text/plain, one of the page types
+    store, fetcher = FakeStore(), replay({'http://test.lv/0/': '<a>a</a>'}, error_rate=1)
+    scraper = scraper_class(Queue(), sitemap, store, fetcher=fetcher)
+    scraper.run()
+    assert scraper.stats['rejected_pages'] == scraper.stats['pages'] == 2
+    assert scraper.stats['parses'] == 0
+    assert store.data == []
+
+@pytest.mark.parametrize('scraper_class', [Scraper, AsyncScraper])
+def test_scraper_saves_every_record_of_a_page(replay, scraper_class):
+    sitemap = Sitemap('test', [TextSelector('a', css='a')], start_urls='http://test.lv/')
+    store, fetcher = FakeStore(), replay({'http://test.lv/': '<a>1</a><a>2</a><a>3</a>'})
+    scraper = scraper_class(Queue(), sitemap, store, fetcher=fetcher)
+    scraper.run()
+    assert store.data == [{'a': '1'}, {'a': '2'}, {'a': '3'}]
+    assert scraper.stats['records'] == 3
+
 def test_record_can_have_child_jobs():
     selectors = [LinkSelector('link_with_childs', many=1, css='a'),
                  LinkSelector('link_without_childs', many=1, css='a'),
@@ -77,3 +176,367 @@ def test_file_name_from_image_url():
     assert Scraper.get_file_name('http://example.com/' + '0' * 300) == '0' * 130
     # image url without http://
     assert Scraper.get_file_name('image.jpg') == 'image.jpg'
+
+def test_async_scraper_same_records_as_scraper(replay):
+    pages, sitemap = numbered_pages(10)
+    fetcher = replay(pages)
+    sync_store, async_store = FakeStore(), FakeStore()
+    scraper = Scraper(Queue(), sitemap, sync_store, fetcher=fetcher)
+    scraper.run()
+    AsyncScraper(Queue(), sitemap, async_store, concurrency=3, fetcher=fetcher).run()
+    assert len(sync_store.data) == 10
+    assert scraper.stats['pages'] == scraper.stats['parses'] == 10
+    assert scraper.get_stats()['css_cache_hits'] >= 9
+    assert sorted(sync_store.data, key=str) == sorted(async_store.data, key=str)
+
+def test_async_scraper_parses_in_processes(replay):
+    pages = {'http://test.lv/%d/' % i: '<b>%d</b><a href="/next/%d/">next</a>' % (i, i)
+             for i in range(6)}
+    pages.update({'http://test.lv/next/%d/' % i: '<b>next %d</b>' % i for i in range(6)})
+    selectors = [TextSelector('b', many=0, css='b'),
+                 LinkSelector('link', many=0, css='a'),
+                 TextSelector('next', many=0, css='b', parents=['link'])]
+    sitemap = Sitemap('test', selectors, start_urls='http://test.lv/[0-5]/')
+    fetcher = replay(pages)
+    thread_store, process_store = FakeStore(), FakeStore()
+    AsyncScraper(Queue(), sitemap, thread_store, concurrency=3, fetcher=fetcher).run()
+    scraper = AsyncScraper(Queue(), sitemap, process_store, concurrency=3, parse_processes=2,
+                           fetcher=fetcher)
+    scraper.run()
+    assert len(process_store.data) == 6
+    assert scraper.stats['pages'] == scraper.stats['parses'] == 12
+    assert sorted(thread_store.data, key=str) == sorted(process_store.data, key=str)
+
+def test_async_scraper_fetches_concurrently(fake_get):
+    pages, sitemap = numbered_pages(8)
+    _, stats = fake_get(pages, delay=0.05)
+    store = FakeStore()
+    AsyncScraper(Queue(), sitemap, store, concurrency=4).run()
+    assert len(store.data) == 8
+    assert 1 < stats['max_running'] <= 4
+
+def test_async_scraper_writes_store_off_the_loop(replay):
+    pages, sitemap = numbered_pages(4)
+    store = FakeStore()
+    records = store.get_sitemap_data('test')
+    threads = set()
+    def save(record):
+        threads.add(threading.current_thread())
+        store.data.append(record)
+    records.save = save
+    store.get_sitemap_data = Mock(return_value=records)
+    AsyncScraper(Queue(), sitemap, store, concurrency=2, fetcher=replay(pages)).run()
+    assert len(store.data) == 4
+    assert len(threads) == 1 and threading.current_thread() not in threads
+
+def test_async_scraper_raises_job_errors():
+    _, sitemap = numbered_pages(4)
+    with patch.object(Fetcher, 'get', side_effect=IOError('down')):
+        with pytest.raises(IOError):
+            AsyncScraper(Queue(), sitemap, FakeStore()).run()
+
+def test_scraper_shares_fetcher_with_jobs():
+    fetcher = Fetcher()
+    _, sitemap = numbered_pages(1)
+    with patch.object(fetcher, 'get', return_value=FakeResponse('<b>b</b>')) as get_mock:
+        Scraper(Queue(), sitemap, FakeStore(), fetcher=fetcher).run()
+    assert get_mock.call_args_list == [call('http://test.lv/0/',
+                                            content_types=fetcher.page_types)]
+
+def test_scraper_resumes_persistent_queue(tmpdir, replay):
+    path = str(tmpdir.join('frontier.sqlite'))
+    pages, sitemap = numbered_pages(4)
+    fetcher = replay(pages)
+    store = FakeStore()
+    queue = SqliteQueue(path)
+    scraper = Scraper(queue, sitemap, store, fetcher=fetcher)
+    scraper.init_first_jobs()
+    scraper._run_job(scraper.get_next_job())
+    queue.close()
+
+    queue = SqliteQueue(path)
+    with patch.object(fetcher, 'get', wraps=fetcher.get) as get_mock:
+        Scraper(queue, sitemap, store, fetcher=fetcher).run()
+    queue.close()
+    assert len(get_mock.call_args_list) == 3
+    assert sorted(r['b'] for r in store.data) == ['0', '1', '2', '3']
+
+def test_plan_built_once_per_parent_id():
+    selectors = [LinkSelector('link', many=1, css='a'),
+                 TextSelector('b', many=0, css='b', parents=['link'])]
+    scraper = Scraper(Queue(), Sitemap('test', selectors), FakeStore())
+    find_trees = Sitemap._find_trees
+    with patch.object(Sitemap, '_find_trees', autospec=True, side_effect=find_trees) as find_mock:
+        plan = scraper.get_plan('link')
+        assert scraper.get_plan('link') is plan
+        assert plan.parent_id == 'link'
+        assert [[s.id for s in t] for t in plan.trees] == [['b']]
+        assert scraper.get_plan('_root') is not plan
+    assert find_mock.call_count == 2
+
+def test_scraper_flushes_records_on_error():
+    _, sitemap = numbered_pages(2)
+    store = FakeStore()
+    scraper = Scraper(Queue(), sitemap, store)
+    records = scraper.get_records()
+    records.flush = Mock()
+    responses = [FakeResponse('<b>0</b>'), IOError('down')]
+    with patch.object(Fetcher, 'get', side_effect=responses):
+        with pytest.raises(IOError):
+            scraper.run()
+    assert records.flush.call_count == 1
+    assert store.data == [{'b': '0'}]
+
+def test_scraper_honours_request_interval(replay):
+    pages, sitemap = numbered_pages(3)
+    scraper = Scraper(Queue(), sitemap, FakeStore(), request_interval=50, fetcher=replay(pages))
+    started = time.monotonic()
+    scraper.run()
+    assert time.monotonic() - started >= 0.1
+
+def test_async_scraper_limits_hosts_separately(fake_get):
+    pages, sitemap = numbered_pages(['http://slow.lv/%d/' % i for i in range(4)] +
+                                    ['http://fast.lv/'])
+    fetched = {}
+    fake_get(pages, before=lambda url: fetched.setdefault(url, time.monotonic()))
+    store = FakeStore()
+    started = time.monotonic()
+    AsyncScraper(Queue(), sitemap, store, concurrency=2, request_interval=100).run()
+    assert len(store.data) == 5
+    # the last queued page doesn't wait behind the slow host
+    assert fetched['http://fast.lv/'] - started < 0.1
+    assert fetched['http://slow.lv/3/'] - started >= 0.3
+
+def test_async_scraper_pauses_hosts_after_pages(fake_get):
+    urls = ['http://slow.lv/%d/' % i for i in range(4)] + ['http://fast.lv/']
+    pages, sitemap = numbered_pages(urls)
+    fetched = {}
+    fake_get(pages, before=lambda url: fetched.setdefault(url, time.monotonic()))
+    store = FakeStore()
+    started = time.monotonic()
+    AsyncScraper(Queue(), sitemap, store, concurrency=4, pageload_delay=100).run()
+    assert len(store.data) == 5
+    starts = sorted(fetched[url] for url in urls[:4])
+    assert all(b - a >= 0.1 for a, b in zip(starts, starts[1:]))
+    # pages of other hosts are fetched meanwhile
+    assert fetched['http://fast.lv/'] - started < 0.1
+
+def test_selector_delay_pauses_host():
+    sitemap = Sitemap('test', [TextSelector('b', many=0, css='b', delay=30)])
+    scraper = Scraper(Queue(), sitemap, FakeStore(), pageload_delay=20)
+    job = Mock(parent_id='_root')
+    assert scraper.get_pageload_delay(job) == 0.05
+    scraper = Scraper(Queue(), sitemap, FakeStore(), pageload_delay=20, delays=False)
+    assert scraper.get_pageload_delay(job) == 0
+
+def test_workers_share_frontier(tmpdir, replay):
+    path = str(tmpdir.join('frontier.sqlite'))
+    pages, sitemap = numbered_pages(10)
+    fetcher = replay(pages, latency=0.01)
+    stores = [FakeStore(), FakeStore()]
+    errors = []
+    def work(name, store):
+        queue = SqliteQueue(path, name)
+        try:
+            scraper = Scraper(queue, sitemap, store, fetcher=fetcher)
+            scraper.poll_interval = 0.01
+            scraper.run()
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+        finally:
+            queue.close()
+    with patch.object(fetcher, 'get', wraps=fetcher.get) as get_mock:
+        workers = [threading.Thread(target=work, args=('w%d' % i, store))
+                   for i, store in enumerate(stores)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    assert not errors
+    assert all(store.data for store in stores)
+    assert sorted(r['b'] for store in stores for r in store.data) == [str(i) for i in range(10)]
+    assert get_mock.call_count == 10
+
+def test_worker_reclaims_expired_lease(tmpdir, replay):
+    path = str(tmpdir.join('frontier.sqlite'))
+    pages, sitemap = numbered_pages(2)
+    crashed = SqliteQueue(path, 'crashed', lease_timeout=0.1)
+    Scraper(crashed, sitemap, FakeStore()).init_first_jobs()
+    crashed.get_next_job()
+    store = FakeStore()
+    queue = SqliteQueue(path, 'worker')
+    fetcher = replay(pages)
+    scraper = Scraper(queue, sitemap, store, fetcher=fetcher)
+    scraper.poll_interval = 0.02
+    with patch.object(fetcher, 'get', wraps=fetcher.get) as get_mock:
+        scraper.run()
+    assert sorted(c[0][0] for c in get_mock.call_args_list) == sorted(pages)
+    assert len(store.data) == 2
+
+def test_async_scraper_renews_leases(tmpdir, fake_get):
+    path = str(tmpdir.join('frontier.sqlite'))
+    pages, sitemap = numbered_pages(4)
+    stolen = []
+    def steal(url):
+        other = SqliteQueue(path, 'other')
+        stolen.append(other.get_next_job())
+        other.close()
+    fake_get(pages, delay=0.1, before=steal)
+    queue = SqliteQueue(path, 'worker', lease_timeout=0.2)
+    store = FakeStore()
+    # all jobs are leased at once, the last ones wait longer than lease_timeout
+    AsyncScraper(queue, sitemap, store, concurrency=1).run()
+    queue.close()
+    assert stolen == [False] * 4
+    assert len(store.data) == 4
+
+def test_unchanged_pages_reuse_records(tmpdir, replay):
+    pages = {'http://test.lv/': '<b>b</b><a href="/next/">next</a>',
+             'http://test.lv/next/': '<b>next</b>'}
+    selectors = [LinkSelector('link', many=0, css='a'),
+                 TextSelector('b', many=0, css='b', parents=['link'])]
+    sitemap = Sitemap('test', selectors, start_urls='http://test.lv/')
+    path = str(tmpdir.join('pages.sqlite'))
+    stores = []
+    for i in range(3):
+        if i == 2:
+            pages['http://test.lv/next/'] = '<b>changed</b>'
+        store = FakeStore()
+        with PageStore(path) as page_store:
+            scraper = Scraper(Queue(), sitemap, store, pages=page_store, fetcher=replay(pages))
+            scraper.run()
+        stores.append(store)
+        if i == 0:
+            assert scraper.stats['unchanged_pages'] == 0
+            assert scraper.stats['parses'] == 2
+        if i == 1:
+            assert scraper.stats['unchanged_pages'] == 2
+            assert scraper.stats['parses'] == 0
+        if i == 2:
+            assert scraper.stats['unchanged_pages'] == 1
+            assert scraper.stats['parses'] == 1
+    assert stores[0].data == stores[1].data == [{'link': 'next', 'link-href': '/next/',
+                                                 'b': 'next'}]
+    assert stores[2].data[0]['b'] == 'changed'
+
+def test_changed_sitemap_extracts_again(tmpdir, replay):
+    sitemap = Sitemap('test', [TextSelector('b', many=0, css='b')], start_urls='http://test.lv/')
+    path = str(tmpdir.join('pages.sqlite'))
+    fetcher = replay({'http://test.lv/': '<b>b</b><i>i</i>'})
+    with PageStore(path) as page_store:
+        Scraper(Queue(), sitemap, FakeStore(), pages=page_store, fetcher=fetcher).run()
+        sitemap['b'].css = 'i'
+        store = FakeStore()
+        scraper = Scraper(Queue(), sitemap, store, pages=page_store, fetcher=fetcher)
+        scraper.run()
+    assert scraper.stats['unchanged_pages'] == 0
+    assert store.data == [{'b': 'i'}]
+
+@pytest.mark.parametrize('scraper_class', [Scraper, AsyncScraper])
+def test_rejected_pages_are_skipped(scraper_class):
+    _, sitemap = numbered_pages(4)
+    store = FakeStore()
+    def get(url, **kwds):
+        if url != 'http://test.lv/1/':
+            raise RejectedResponse('too large')
+        return FakeResponse('<b>1</b>')
+    with patch.object(Fetcher, 'get', side_effect=get):
+        scraper = scraper_class(Queue(), sitemap, store)
+        scraper.run()
+    assert scraper.stats['rejected_pages'] == 3
+    assert store.data == [{'b': '1'}]
+
+def test_images_downloaded_once_per_url(tmpdir, replay):
+    pages = {'http://test.lv/%d/' % i: '<img src="/img/a.png">' for i in range(3)}
+    sitemap = Sitemap('test', [ImageSelector('img', many=0, css='img', download_image=True)],
+                      start_urls='http://test.lv/[0-2]/')
+    images = ImageFileStore(str(tmpdir))
+    store = FakeStore()
+    with patch.object(ImageFileStore, 'download', return_value='ab/abc/a.png') as download:
+        scraper = AsyncScraper(Queue(), sitemap, store, concurrency=3, images=images,
+                               fetcher=replay(pages))
+        scraper.run()
+    assert download.call_count == 1
+    assert download.call_args[0][1:] == ('http://test.lv/img/a.png', 'a.png')
+    assert scraper.stats['images'] == 1
+    assert store.data == [{'img-src': '/img/a.png', 'img-file': 'ab/abc/a.png'}] * 3
+
+def test_image_of_follow_record(tmpdir, replay):
+    pages = {'http://test.lv/a/': '<img src="img.png"><a href="/b/">b</a>',
+             'http://test.lv/b/': '<b>b</b>'}
+    selectors = [ImageSelector('img', many=0, css='img', download_image=True),
+                 LinkSelector('link', many=0, css='a'),
+                 TextSelector('b', many=0, css='b', parents=['link'])]
+    sitemap = Sitemap('test', selectors, start_urls='http://test.lv/a/')
+    store = FakeStore()
+    scraper = Scraper(Queue(), sitemap, store, images=ImageFileStore(str(tmpdir)),
+                      fetcher=replay(pages))
+    with patch.object(ImageFileStore, 'download', return_value='ab/abc/img.png') as download, \
+            patch.object(scraper.limiter, 'reserve', return_value=0) as reserve:
+        scraper.run()
+    # the image is relative to the page it is on, not to the followed one
+    assert download.call_args[0][1] == 'http://test.lv/a/img.png'
+    assert call('http://test.lv/a/img.png') in reserve.call_args_list
+    assert store.data == [{'img-src': 'img.png', 'img-file': 'ab/abc/img.png', 'link': 'b',
+                           'link-href': '/b/', 'b': 'b'}]
+
+def test_image_backlog_holds_back_jobs(tmpdir, fake_get):
+    pages = {'http://test.lv/%d/' % i: '<img src="%d.png">' % i for i in range(3)}
+    sitemap = Sitemap('test', [ImageSelector('img', many=0, css='img', download_image=True)],
+                      start_urls='http://test.lv/[0-2]/')
+    events = []
+    fake_get(pages, before=lambda url: events.append('page'))
+    def download(fetcher, url, name):
+        time.sleep(0.02)
+        events.append('image')
+        return name
+    scraper = Scraper(Queue(), sitemap, FakeStore(), images=ImageFileStore(str(tmpdir)))
+    scraper.max_pending_images = 1
+    with patch.object(ImageFileStore, 'download', side_effect=download):
+        scraper.run()
+    assert events == ['page', 'image'] * 3
+
+def test_failed_image_download(tmpdir, replay):
+    sitemap = Sitemap('test', [ImageSelector('img', many=0, css='img', download_image=True)],
+                      start_urls='http://test.lv/')
+    store = FakeStore()
+    fetcher = replay({'http://test.lv/': '<img src="a.png">'})
+    with patch.object(ImageFileStore, 'download', side_effect=IOError('gone')):
+        scraper = Scraper(Queue(), sitemap, store, images=ImageFileStore(str(tmpdir)),
+                          fetcher=fetcher)
+        scraper.run()
+    assert scraper.stats['failed_images'] == 1
+    assert store.data == [{'img-src': 'a.png', 'img-file': None}]
+
+def test_scraper_metrics(replay):
+    pages, sitemap = numbered_pages(3)
+    fetcher = replay(pages)
+    sink = Mock()
+    metrics = Metrics([sink], interval=3600)
+    scraper = Scraper(Queue(), sitemap, FakeStore(), metrics=metrics, fetcher=fetcher)
+    scraper.run()
+    assert scraper.observer is None
+    assert 'selector_seconds,selector=b' not in metrics.snapshot()['histograms']
+    Scraper(Queue(), sitemap, FakeStore(), metrics=metrics, observer=metrics,
+            fetcher=fetcher).run()
+    assert sink.write.call_count == 2
+    state = metrics.snapshot()
+    assert state['gauges']['pages'] == state['gauges']['records'] == 3
+    assert state['gauges']['seen'] == 3
+    assert state['gauges']['queue_depth'] == 0
+    assert state['histograms']['parse_seconds']['count'] == 6
+    assert state['histograms']['selector_seconds,selector=b']['count'] == 3
+
+def test_scraper_max_pages(replay):
+    pages, sitemap = numbered_pages(5)
+    store = FakeStore()
+    scraper = AsyncScraper(Queue(), sitemap, store, max_pages=2, fetcher=replay(pages))
+    scraper.run()
+    assert scraper.stats['pages'] == 2
+    assert len(store.data) == 2
+
+def test_scraper_observer(replay):
+    pages, sitemap = numbered_pages(1)
+    profiler = Profiler()
+    Scraper(Queue(), sitemap, FakeStore(), observer=profiler, fetcher=replay(pages)).run()
+    assert profiler.get_report()[0]['records'] == 1
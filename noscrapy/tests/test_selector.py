@@ -1,5 +1,5 @@
 import pytest
-from mock import call, patch
+from mock import patch
 
 from noscrapy import Selector
 from noscrapy.utils import Field, PyQuery
@@ -76,12 +76,12 @@ def test_selector_get_data(inner_get_data_mock):
     assert list(Selector(id='id', css='a').get_data('<a>a</a>')) == [{'a': 'a'}]
 
 @patch.object(Selector, '_get_data')
-@patch('noscrapy.selector.sleep')
-def test_selector_get_data_delay(sleep_mock, inner_get_data_mock):
+@patch('time.sleep')
+def test_selector_get_data_delay_does_not_sleep(sleep_mock, inner_get_data_mock):
     inner_get_data_mock.return_value = iter([{'a': 'a'}])
     selector = Selector(id='a', css='a', delay=100)
     actual = list(selector.get_data('<a>a</a>'))
-    assert sleep_mock.call_args_list == [call(100)]
+    assert sleep_mock.call_args_list == []
     assert actual == [{'a': 'a'}]
 
 def test_columns():
@@ -141,6 +141,40 @@ def test_items_selector_regex(item_data_mock):
     item_data_mock.return_value = iter([{'id': 'text'}])
     assert list(selector.get_data('<a>text</a>')) == [{'id': 'text'}]
 
+@patch.object(Selector, '_get_item_data')
+def test_items_selector_regex_without_value(item_data_mock):
+    selector = Selector('id', css='a', regex=r'[a-z]{4}')
+    item_data_mock.return_value = iter([{'id': None}])
+    assert list(selector.get_data('<a>1234</a>')) == [{'id': None}]
+
+def test_regex_compiled_once():
+    selector = Selector('id', regex=r'[a-z]{4}')
+    pattern = selector.__dict__['_pattern']
+    assert selector.regex == r'[a-z]{4}'
+    assert selector.__dict__['_pattern'] is pattern
+    selector.regex = r'\d+'
+    assert selector.__dict__['_pattern'].pattern == r'\d+'
+    selector.regex = None
+    assert selector.__dict__['_pattern'] is None
+
+def test_apply_regex_to_batch():
+    selector = Selector('id', regex=r'\d+')
+    results = [{'id': 'a1'}, {'id': 'b'}, {'id': None}, {'other': 'c3'}]
+    selector.apply_regex(results)
+    assert results == [{'id': '1'}, {'id': None}, {'id': None}, {'other': 'c3'}]
+
+@patch.object(Selector, '_get_item_data')
+def test_items_selector_regex_groups(item_data_mock):
+    selector = Selector('id', css='a', regex=r'(?P<price>\d+) (?P<currency>[A-Z]+)',
+                        regex_groups=True)
+    assert selector.columns == ('id', 'id-price', 'id-currency')
+    assert Selector('id', regex=r'(?P<price>\d+)').columns == ('id',)
+
+    item_data_mock.return_value = iter([{'id': 'for 10 EUR'}, {'id': 'free'}])
+    assert list(selector.get_data('<a>a</a><a>b</a>')) == [
+        {'id': '10 EUR', 'id-price': '10', 'id-currency': 'EUR'},
+        {'id': None, 'id-price': None, 'id-currency': None}]
+
 def test_items_selector_get_item_data_has_to_be_implemented():
     with pytest.raises(NotImplementedError):
         list(Selector('id', css='a')._get_data('<a>test</a>'))
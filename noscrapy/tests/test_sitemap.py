@@ -95,6 +95,30 @@ def test_get_direct_childs():
     actual_selectors = list(Sitemap(dicts).get_direct_childs('a'))
     assert actual_selectors == expected_dicts
 
+def test_index_follows_changes():
+    sitemap = Sitemap([dict(id='a', type='ItemSelector', many=False),
+                       dict(id='b', type='TextSelector', parents=['a'], many=False)])
+    assert [s.id for s in sitemap.get_direct_childs('a')] == ['b']
+    assert not sitemap.will_return_many('a')
+
+    sitemap.append(dict(id='c', type='TextSelector', parents=['a'], many=True))
+    assert [s.id for s in sitemap.get_direct_childs('a')] == ['b', 'c']
+    assert sitemap.will_return_many('a')
+
+    sitemap['a'] = dict(id='d', type='ItemSelector', many=False)
+    assert list(sitemap.get_direct_childs('a')) == []
+    assert [s.id for s in sitemap.get_all('d')] == ['b', 'c']
+
+    del sitemap['c']
+    assert not sitemap.will_return_many('d')
+    assert sitemap.get('c') is None
+
+    # direct changes of selectors need an explicit invalidate
+    sitemap['b'].many = True
+    assert not sitemap.will_return_many('d')
+    sitemap.invalidate()
+    assert sitemap.will_return_many('d')
+
 def test_will_return_many():
     sitemap = Sitemap([
         dict(id='a', type='ItemSelector', many=False),
@@ -439,6 +463,17 @@ def test_trees(selectors, expected):
     result = [[s.id for s in t] for t in Sitemap(selectors).trees]
     assert result == expected
 
+def test_trees_are_cached_per_parent_id():
+    sitemap = Sitemap([LinkSelector('a', many=1), TextSelector('b', many=0, parents=['a'])])
+    trees = sitemap.trees
+    assert sitemap.trees is trees
+    sitemap.parent_id = 'a'
+    assert [[s.id for s in t] for t in sitemap.trees] == [['b']]
+    sitemap.parent_id = '_root'
+    assert sitemap.trees is trees
+    sitemap.append(TextSelector('c', many=0))
+    assert [[s.id for s in t] for t in sitemap.trees] == [['c', 'a']]
+
 HTML1 = '<a href="http://x.y/a/">A</a><a href="http://x.y/b/">B</a><span class="c">C</span>'
 HTML2 = '<div><a href="http://x.y/a/">A</a></div><div><a href="http://x.y/b/">B</a></div>'
 HTML3 = ('<div><table><tr><td>result1</td></tr><tr><td>result2</td></tr></table>'
@@ -0,0 +1,152 @@
+import json
+import re
+from collections import namedtuple
+
+import pytest
+from mock import Mock, patch
+
+from noscrapy.store import StoreScrapeResult
+
+Row = namedtuple('Row', 'id key doc')
+
+
+class FakeDb(object):
+    def __init__(self):
+        self.docs = {}
+        self.updates = []
+        self.views = []
+        self.saves = []
+
+    def update(self, docs):
+        self.updates.append(len(docs))
+        results = []
+        for doc in docs:
+            doc_id = doc.get('_id', str(len(self.docs)))
+            self.docs[doc_id] = dict(doc, _id=doc_id)
+            results.append((True, doc_id, '1-x'))
+        return results
+
+    def get(self, doc_id):
+        return self.docs.get(doc_id)
+
+    def save(self, doc):
+        self.saves.append(doc['_id'])
+        self.docs[doc['_id']] = dict(doc)
+
+    def view(self, name, **options):
+        assert options['include_docs']
+        self.views.append(dict(options, name=name))
+        if name == '_all_docs':
+            rows = [Row(id=k, key=k, doc=v) for k, v in sorted(self.docs.items())
+                    if k >= options.get('startkey', '')]
+        else:
+            # emulate the map function by taking the emitted keys out of it
+            design, view = name.split('/')
+            map_fun = self.docs['_design/' + design]['views'][view]['map']
+            keys = [json.loads(k) for k in re.findall(r'doc\[("[^"]*")\]', map_fun)]
+            rows = sorted(Row(id=k, key=[v.get(key) for key in keys], doc=v)
+                          for k, v in self.docs.items() if not k.startswith('_design/'))
+            rows = [r for r in rows if r.key == options['startkey'] == options['endkey'] and
+                    r.id >= options.get('startkey_docid', '')]
+        return rows[:options['limit']]
+
+def test_save_in_batches():
+    db = FakeDb()
+    on_flush = Mock()
+    records = StoreScrapeResult(db, batch_size=2, on_flush=on_flush)
+    for i in range(5):
+        records.save({'a': i, '_follow': 'x'})
+    records.save({})
+    assert db.updates == [2, 2]
+    assert records.pending == 1
+    records.flush()
+    assert db.updates == [2, 2, 1]
+    assert sorted(d['a'] for d in db.docs.values()) == [0, 1, 2, 3, 4]
+    assert all('_follow' not in d for d in db.docs.values())
+    assert [c[0][0] for c in on_flush.call_args_list] == [2, 2, 1]
+    assert records.stats['batches'] == 3
+    assert records.stats['records'] == 5
+
+def test_failed_write_keeps_records():
+    db = FakeDb()
+    records = StoreScrapeResult(db)
+    records.save({'a': 1})
+    with patch.object(db, 'update', side_effect=IOError('conflict')):
+        with pytest.raises(IOError):
+            records.flush()
+    assert records.pending == 1
+    records.flush()
+    assert [d['a'] for d in db.docs.values()] == [1]
+    assert records.stats['records'] == 1
+
+def test_flush_after_interval():
+    db = FakeDb()
+    records = StoreScrapeResult(db, flush_interval=0)
+    records.save({'a': 1})
+    assert db.updates == [1]
+
+def test_flush_on_exit_and_read():
+    db = FakeDb()
+    with StoreScrapeResult(db) as records:
+        records.save({'a': 1})
+        assert db.updates == []
+        assert [r['a'] for r in records] == [1]
+        records.save({'a': 2})
+    assert db.updates == [1, 1]
+
+def test_failed_write_raises():
+    db = FakeDb()
+    db.update = Mock(return_value=[(True, 'w', '1-x'), (False, 'x', ValueError('conflict'))])
+    records = StoreScrapeResult(db)
+    records.save({'_id': 'w'})
+    records.save({'_id': 'x'})
+    with pytest.raises(ValueError):
+        records.flush()
+    # only the failed record is written again
+    assert records.pending == 1
+    records.flush()
+    assert db.update.call_args[0][0] == [{'_id': 'x'}]
+
+def test_iterate_in_pages():
+    db = FakeDb()
+    for i in range(7):
+        db.docs['%02d' % i] = {'_id': '%02d' % i, 'a': i}
+    db.docs['_design/noscrapy'] = {'_id': '_design/noscrapy', 'views': {}}
+    records = StoreScrapeResult(db, page_size=3)
+    assert [r['a'] for r in records] == list(range(7))
+    assert [v.get('startkey') for v in db.views] == [None, '03', '06']
+    assert all(v['limit'] == 4 for v in db.views)
+
+def test_stop_iteration_early():
+    db = FakeDb()
+    for i in range(7):
+        db.docs['%02d' % i] = {'_id': '%02d' % i, 'a': i}
+    records = StoreScrapeResult(db, page_size=3)
+    for record in records:
+        break
+    assert len(db.views) <= 2
+
+def test_filter_with_persistent_view():
+    db = FakeDb()
+    for i in range(7):
+        db.docs['%02d' % i] = {'_id': '%02d' % i, 'a': i % 2, 'b': 'x'}
+    records = StoreScrapeResult(db, page_size=2)
+    assert [r['_id'] for r in records.filter(b='x', a=1)] == ['01', '03', '05']
+    assert [r['_id'] for r in records.filter(a=1, b='x')] == ['01', '03', '05']
+    assert [r['_id'] for r in records.filter(a=0)] == ['00', '02', '04', '06']
+    # one view per key combination, saved once
+    assert db.saves == ['_design/noscrapy', '_design/noscrapy']
+    assert len(db.docs['_design/noscrapy']['views']) == 2
+    assert [v['startkey_docid'] for v in db.views if 'startkey_docid' in v][:1] == ['05']
+
+    # an existing view is reused by a new instance
+    records = StoreScrapeResult(db)
+    assert len(list(records.filter(a=0))) == 4
+    assert len(db.saves) == 2
+
+def test_filter_is_lazy():
+    db = FakeDb()
+    records = StoreScrapeResult(db)
+    result = records.filter(a=1)
+    assert not db.views
+    assert list(result) == []
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from noscrapy.stores import BACKENDS, SqliteStore, get_data_store
+
+
+def test_sqlite_store(tmpdir):
+    store = SqliteStore(str(tmpdir.join('data.sqlite')))
+    with store.get_sitemap_data('a') as records:
+        records.save({'a': '1', 'b': None, '_follow': 'x'})
+        records.save({'a': '2', 'b': ['c']})
+    with store.get_sitemap_data('other') as records:
+        records.save({'a': '1'})
+    records = store.get_sitemap_data('a')
+    assert list(records) == [{'a': '1', 'b': None}, {'a': '2', 'b': ['c']}]
+    assert list(records.filter(a='2')) == [{'a': '2', 'b': ['c']}]
+    assert list(records.filter(a='1', b=None)) == [{'a': '1', 'b': None}]
+    assert list(records.filter(a='3')) == []
+    store.reset_sitemap_data_db('a')
+    assert list(store.get_sitemap_data('a')) == []
+    assert len(list(store.get_sitemap_data('other'))) == 1
+
+def test_sqlite_store_replaces_records_with_id(tmpdir):
+    store = SqliteStore(str(tmpdir.join('data.sqlite')))
+    with store.get_sitemap_data('a') as records:
+        records.save({'_id': 'x', 'a': '1'})
+        records.save({'_id': 'x', 'a': '2'})
+    assert list(store.get_sitemap_data('a')) == [{'_id': 'x', 'a': '2'}]
+
+def test_parquet_store(tmpdir):
+    pytest.importorskip('pyarrow')
+    store = get_data_store('parquet', str(tmpdir.join('data')))
+    with store.get_sitemap_data('a') as records:
+        records.batch_size = 2
+        for i in range(3):
+            records.save({'a': str(i), 'b': [i], '_follow': 'x'})
+        records.save({'c': 'c'})
+    records = store.get_sitemap_data('a')
+    assert len(records.get_part_paths()) == 2
+    assert list(records) == [{'a': '0', 'b': '[0]'}, {'a': '1', 'b': '[1]'},
+                             {'a': '2', 'b': '[2]', 'c': None}, {'a': None, 'b': None, 'c': 'c'}]
+    assert list(records.filter(c='c')) == [{'a': None, 'b': None, 'c': 'c'}]
+    store.reset_sitemap_data_db('a')
+    assert list(store.get_sitemap_data('a')) == []
+
+def test_parquet_store_with_several_writers(tmpdir):
+    pytest.importorskip('pyarrow')
+    store = get_data_store('parquet', str(tmpdir.join('data')))
+    first, second = store.get_sitemap_data('a'), store.get_sitemap_data('a')
+    first.save({'a': '1'})
+    second.save({'a': '2'})
+    second.flush()
+    first.flush()
+    first.save({'a': '3'})
+    first.flush()
+    records = store.get_sitemap_data('a')
+    assert len(records.get_part_paths()) == 3
+    assert sorted(r['a'] for r in records) == ['1', '2', '3']
+    assert [r['a'] for r in records if r['a'] != '2'] == ['1', '3']
+    assert not [n for n in os.listdir(records.path) if n.endswith('.tmp')]
+
+def test_get_data_store(tmpdir):
+    assert sorted(BACKENDS) == ['couch', 'parquet', 'sqlite']
+    assert isinstance(get_data_store('sqlite', str(tmpdir.join('x'))), SqliteStore)
+    with pytest.raises(ValueError):
+        get_data_store('sqlite')
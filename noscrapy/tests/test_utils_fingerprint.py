@@ -0,0 +1,32 @@
+import pytest
+
+from noscrapy.utils import BloomFilter, FingerprintSet, fingerprint
+
+
+def test_fingerprint():
+    assert fingerprint('http://test.lv/') == fingerprint('http://test.lv/')
+    assert fingerprint('http://test.lv/') != fingerprint('http://test.lv/1')
+    assert fingerprint('http://test.lv/') < 2 ** 64
+
+def test_fingerprint_set():
+    urls = FingerprintSet(['http://test.lv/'])
+    assert 'http://test.lv/' in urls
+    assert 'http://test.lv/1' not in urls
+    urls.add('http://test.lv/1')
+    urls.add('http://test.lv/1')
+    assert 'http://test.lv/1' in urls
+    assert len(urls) == 2
+
+def test_bloom_filter():
+    urls = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        urls.add('http://test.lv/%d' % i)
+    assert all('http://test.lv/%d' % i in urls for i in range(1000))
+    assert len(urls) <= 1000
+    false_positives = sum('http://test.lv/x%d' % i in urls for i in range(10000))
+    assert false_positives < 300
+
+def test_bloom_filter_size():
+    assert len(BloomFilter(1000000, 0.01).bits) < 1300000
+    with pytest.raises(ValueError):
+        BloomFilter(10, 0)
@@ -1,6 +1,7 @@
 import pytest
 
-from noscrapy.utils import PyQuery, attribute_mapper
+from noscrapy.utils import (PyQuery, attribute_mapper, compile_css, parse_count, parse_html,
+                            select)
 
 
 def test_attribute_mapper_to_python():
@@ -59,3 +60,32 @@ def test_map_items():
     pq = PyQuery('<p><span>1</span></p><p><a>2</a><a>3</a></p>')
     result = pq.map_items(lambda item, index, count: list(item('a, span').items()), 'p')
     assert result == ['<span>1</span>', '<a>2</a>', '<a>3</a>']
+
+def test_parse_html():
+    count = parse_count()
+    assert parse_html('<a>a</a>') == PyQuery('<a>a</a>')
+    assert list(parse_html('  ')) == []
+    assert list(parse_html(b'')) == []
+    assert parse_count() == count + 3
+
+SELECT = {
+    'tag': 'a',
+    'nested': 'div a',
+    'attribute': 'a[href="y"]',
+    'jquery_pseudo': 'a:first',
+    'nth': 'div:nth-of-type(2) a',
+    'empty': '',
+    'none': None,
+}
+@pytest.mark.parametrize('css', list(SELECT.values()), ids=list(SELECT))
+def test_select(css):
+    pq = PyQuery('<div><a href="x">a</a></div><div><a href="y">b</a><a>c</a></div>')
+    assert select(pq, css) == pq(css)
+
+def test_compile_css_cache():
+    compile_css.cache_clear()
+    pq = PyQuery('<a>a</a>')
+    for i in range(3):
+        select(pq, 'a')
+    assert compile_css.cache_info().hits == 2
+    assert compile_css.cache_info().misses == 1
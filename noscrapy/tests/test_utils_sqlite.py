@@ -0,0 +1,16 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from noscrapy.utils import SqliteFile
+
+
+def test_sqlite_file(tmpdir):
+    with SqliteFile(str(tmpdir.join('test.sqlite'))) as f:
+        assert f.db.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+        # other threads can use the connection
+        with ThreadPoolExecutor(1) as executor:
+            assert executor.submit(f.db.execute, 'SELECT 1').result().fetchone() == (1,)
+    with pytest.raises(sqlite3.ProgrammingError):
+        f.db.execute('SELECT 1')
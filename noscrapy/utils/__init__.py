@@ -1,5 +1,7 @@
 from .declarative import *
+from .fingerprint import *
 from .pyquery import *
+from .sqlite import *
 from . import json
 import requests
 
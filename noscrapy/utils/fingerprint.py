@@ -0,0 +1,70 @@
+import math
+from hashlib import sha1
+
+__all__ = 'fingerprint', 'FingerprintSet', 'BloomFilter'
+
+def fingerprint(url, size=8):
+    """Returns a stable integer hash of `size` bytes for an url."""
+    return int.from_bytes(sha1(url.encode('utf-8')).digest()[:size], 'big')
+
+class FingerprintSet(object):
+    """Set of urls which only keeps a 64 bit fingerprint per url instead of the url itself.
+
+    Two urls can share a fingerprint, at 100 million urls the chance for any collision is 0.03%.
+    """
+    def __init__(self, urls=()):
+        self.fingerprints = set()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url):
+        self.fingerprints.add(fingerprint(url))
+
+    def __contains__(self, url):
+        return fingerprint(url) in self.fingerprints
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+class BloomFilter(object):
+    """Probabilistic set of urls with a fixed memory size.
+
+        capacity: Number of urls the filter is sized for.
+        error_rate: False positive rate, which is reached when `capacity` urls got added.
+
+    Urls never get reported as missing after being added, but unseen urls get reported as contained
+    with the probability of `error_rate`, so they would be skipped by a crawl.
+    """
+    def __init__(self, capacity=10000000, error_rate=0.001):
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate has to be between 0 and 1')
+        self.capacity = int(capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, url):
+        # double hashing, k positions derived from two 64 bit hashes
+        digest = sha1(url.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, url):
+        added = False
+        for pos in self._positions(url):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, url):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(url))
+
+    def __len__(self):
+        return self.count
@@ -1,10 +1,16 @@
 import keyword
+import threading
+from functools import lru_cache
 from itertools import chain, zip_longest
 
+from lxml import etree
 from pyquery import pyquery
+from pyquery.cssselectpatch import JQueryTranslator
 from pyquery.pyquery import no_default
 
-__all__ = 'attribute_mapper', 'PyQuery'
+__all__ = 'attribute_mapper', 'compile_css', 'parse_count', 'parse_html', 'PyQuery', 'select'
+
+_parses = threading.local()
 
 class FlexibleElement(pyquery.FlexibleElement):
     """property to allow a flexible api"""
@@ -124,6 +130,41 @@ class PyQuery(pyquery.PyQuery):
     def __ne__(self, other):
         return not self == other
 
+def parse_html(content):
+    """Parses html into a PyQuery document, empty content results in an empty PyQuery."""
+    _parses.count = parse_count() + 1
+    try:
+        return PyQuery(content)
+    except (etree.ParserError, etree.XMLSyntaxError) as e:
+        if isinstance(content, (str, bytes)) and (not content.strip() or
+                                                  'Document is empty' == str(e)):
+            return PyQuery(None)
+        raise
+
+@lru_cache(maxsize=1024)
+def compile_css(css, xhtml=False):
+    """Returns the compiled XPath of a css selector, cached process wide by the css string.
+
+    compile_css.cache_info() reports hits and misses.
+    """
+    translator = JQueryTranslator(xhtml=xhtml)
+    xpath = translator.css_to_xpath(css.replace('[@', '['), 'descendant-or-self::')
+    return etree.XPath(xpath)
+
+def select(parent, css):
+    """Same as parent(css), but the css is only translated to XPath once per process."""
+    if not isinstance(css, str) or not css or css.startswith('<') or parent.namespaces:
+        return parent(css)
+    xpath = compile_css(css, parent._translator.xhtml)
+    results = []
+    for tag in parent:
+        results.extend(xpath(tag))
+    return parent._copy(results, parent=parent)
+
+def parse_count():
+    """Returns the number of documents parsed by parse_html in the current thread."""
+    return getattr(_parses, 'count', 0)
+
 class AttributeMapper(object):
     def to_xml(self, name):
         name = name.replace('_', '-')
@@ -0,0 +1,27 @@
+import sqlite3
+from threading import Lock
+
+__all__ = 'SqliteFile',
+
+class SqliteFile(object):
+    """Sqlite file shared by threads, statements on db are run holding the lock.
+
+    It is written in WAL mode without syncing every commit, as the files only keep data which is
+    gathered again if lost. Subclasses create their tables after calling __init__.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
@@ -0,0 +1,29 @@
+from .sitemap import Sitemap
+from .utils import json, parse_count, parse_html
+
+# plans of the worker process by sitemap json and parent_id
+_plans = {}
+
+def build_plan(sitemap, parent_id):
+    """Returns a copy of sitemap to extract the pages of parent_id with its trees already found."""
+    plan = Sitemap(sitemap, parent_id=parent_id)
+    plan.trees
+    return plan
+
+def extract(plan, content, observer=None):
+    """Returns the records of fetched content, all selector trees share one parsed document."""
+    return list(plan.get_data(parse_html(content), observer))
+
+def parse_in_worker(sitemap_json, parent_id, content):
+    """Extracts content in a worker process and returns the records and the number of parses.
+
+    The sitemap is sent as json with every page, each worker builds its plan only once.
+    """
+    key = sitemap_json, parent_id
+    plan = _plans.get(key)
+    if plan is None:
+        plan = build_plan(Sitemap(json.loads(sitemap_json)), parent_id)
+        _plans[key] = plan
+    parses = parse_count()
+    records = extract(plan, content)
+    return records, parse_count() - parses
@@ -20,6 +20,7 @@ setup(
     entry_points={'console_scripts': 'noscrapy=noscrapy.cli:cli'},
     long_description=read('README.rst'),
     install_requires=['pyquery>=1.2.11', 'requests>=2.9.1', 'click==6.6', 'couchdb>=1.0.1'],
+    extras_require={'parquet': ['pyarrow>=0.15.1'], 'zstd': ['zstandard>=0.15.0']},
     tests_require=['mock>=1.3.0', 'pytest>=2.9.1', 'pytest-cov>=2.2.1', 'python-coveralls>=2.7.0'],
     classifiers=[
         "Development Status :: 3 - Alpha",